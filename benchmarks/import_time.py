@@ -0,0 +1,77 @@
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+
+"""
+Benchmark for the cold import time of biosim.simulation.
+
+Each measurement starts a fresh Python process, so nothing is cached in
+sys.modules. The time for starting an empty interpreter is measured the
+same way and subtracted. The script also checks which heavy packages the
+import pulls in.
+"""
+
+__author__ = "Sara Idris & Thorbjørn L Onsaker, NMBU"
+__email__ = "said@nmbu.no & thon@nmbu.no"
+
+HEAVY_MODULES = ('matplotlib', 'scipy', 'subprocess')
+
+
+def cold_start(statement, repeats):
+    """Measures wall time for running a statement in new Python processes.
+
+    :param statement: Python code to run
+    :param repeats: number of processes to start
+    :returns: list with wall time in seconds for each process
+    """
+
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-c', statement], check=True)
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def loaded_modules(module, candidates):
+    """Finds which of the candidate modules are loaded after importing module.
+
+    :returns: list with the names of the loaded candidates
+    """
+
+    code = ('import sys, {}; print(" ".join(m for m in {!r} if m in sys.modules))'
+            .format(module, candidates))
+    result = subprocess.run([sys.executable, '-c', code], check=True,
+                            capture_output=True, text=True)
+    return result.stdout.split()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--module', default='biosim.simulation')
+    parser.add_argument('--repeats', type=int, default=10)
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args(argv)
+
+    empty = statistics.median(cold_start('pass', args.repeats))
+    with_import = statistics.median(cold_start('import ' + args.module, args.repeats))
+    result = {'module': args.module,
+              'repeats': args.repeats,
+              'interpreter_s': empty,
+              'import_s': with_import - empty,
+              'heavy_modules_loaded': loaded_modules(args.module, HEAVY_MODULES)}
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print('Cold import of {module}: {import_s:.3f} s '
+              '(median of {repeats}, interpreter start {interpreter_s:.3f} s)'.format(**result))
+        print('Heavy modules loaded: {}'.format(', '.join(result['heavy_modules_loaded'])
+                                                or 'none'))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+import argparse
+import json
+import random
+import statistics
+import time
+
+import numpy as np
+
+from biosim.animals import Herbivore, Carnivore
+from biosim.landscape import Lowland
+
+"""
+Microbenchmarks for the hot methods of the object API.
+
+Each method is timed on a single Lowland cell, for every combination of
+the herbivore and carnivore counts given. A fresh cell is made before each
+repeat, since most methods change the cell. The output is JSON with one
+entry per method and counts, and the scaling exponent of each method in the
+number of herbivores: the slope of log(time) against log(herbivores), which
+is about 1 for linear and 2 for quadratic methods.
+
+    python benchmarks/micro.py --herbs 100 1000 10000 --carns 10 > micro.json
+"""
+
+__author__ = "Sara Idris & Thorbjørn L Onsaker, NMBU"
+__email__ = "said@nmbu.no & thon@nmbu.no"
+
+
+def make_cell(num_herbs, num_carns):
+    """Creates a Lowland cell with animals of random age and weight.
+
+    :returns: Lowland cell
+    """
+
+    cell = Lowland()
+    cell.list_herbs = [Herbivore(random.randint(0, 20), random.uniform(10, 40))
+                       for _ in range(num_herbs)]
+    cell.list_carns = [Carnivore(random.randint(0, 20), random.uniform(10, 40))
+                       for _ in range(num_carns)]
+    return cell
+
+
+def get_fitness(cell, rng):
+    Herbivore.invalidate_fitness()
+    Carnivore.invalidate_fitness()
+    for animal in cell.list_herbs + cell.list_carns:
+        animal.get_fitness()
+
+
+def consumed_herbs(cell, rng):
+    herbs = sorted(cell.list_herbs, key=lambda herb: herb.get_fitness())
+    for carn in sorted(cell.list_carns, key=lambda carn: -carn.get_fitness()):
+        killed = set(map(id, carn.consumed_herbs(herbs)))
+        herbs = [herb for herb in herbs if id(herb) not in killed]
+
+
+def migrate_all(cell, rng):
+    cell.migrate_all([Lowland() for _ in range(4)])
+
+
+# Name: function calling the method on a cell
+METHODS = {'Animal.get_fitness': get_fitness,
+           'Carnivore.consumed_herbs': consumed_herbs,
+           'Landscape.eat_all': lambda cell, rng: cell.eat_all(rng),
+           'Landscape.give_birth': lambda cell, rng: cell.give_birth(rng),
+           'Landscape.migrate_all': migrate_all,
+           'Landscape.lose_weight': lambda cell, rng: cell.lose_weight(),
+           'Landscape.death': lambda cell, rng: cell.death()}
+
+
+def time_method(name, num_herbs, num_carns, repeats, seed):
+    """Times a method on fresh cells.
+
+    :returns: dictionary with the fastest and median time in seconds
+    """
+
+    times = []
+    for repeat in range(repeats):
+        random.seed(seed + repeat)
+        cell = make_cell(num_herbs, num_carns)
+        rng = np.random.default_rng(seed + repeat)
+        start = time.perf_counter()
+        METHODS[name](cell, rng)
+        times.append(time.perf_counter() - start)
+    return {'method': name, 'herbs': num_herbs, 'carns': num_carns, 'repeats': repeats,
+            'min_s': min(times), 'median_s': statistics.median(times)}
+
+
+def scaling_exponents(results):
+    """Slope of log(time) against log(number of herbivores) for each method.
+
+    Uses the results with the largest carnivore count, and only the methods
+    in the results that were timed for at least two herbivore counts.
+
+    :returns: dictionary with the exponent of each method
+    """
+
+    exponents = {}
+    for name in dict.fromkeys(row['method'] for row in results):
+        rows = [row for row in results if row['method'] == name]
+        carns = max(row['carns'] for row in rows)
+        rows = [row for row in rows if row['carns'] == carns and row['herbs'] > 0]
+        if len(rows) > 1:
+            exponents[name] = float(np.polyfit(np.log([row['herbs'] for row in rows]),
+                                               np.log([row['min_s'] for row in rows]), 1)[0])
+    return exponents
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--methods', nargs='+', choices=list(METHODS), default=list(METHODS))
+    parser.add_argument('--herbs', nargs='+', type=int, default=[10, 100, 1000, 10000])
+    parser.add_argument('--carns', nargs='+', type=int, default=[0, 10, 100])
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', metavar='FILE', help='write JSON to FILE instead of stdout')
+    args = parser.parse_args(argv)
+
+    results = [time_method(name, num_herbs, num_carns, args.repeats, args.seed)
+               for name in args.methods for num_herbs in args.herbs for num_carns in args.carns]
+    report = {'results': results, 'exponents': scaling_exponents(results)}
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(text + '\n')
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
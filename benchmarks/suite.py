@@ -0,0 +1,206 @@
+import argparse
+import json
+import multiprocessing
+import resource
+import sys
+import time
+
+import numpy as np
+
+from biosim.Island import RossumIsland
+from biosim.instrumentation import PhaseLog
+
+"""
+Benchmark suite for the annual cycle on synthetic islands.
+
+Each case builds an island of a given size and landscape mix, spreads a
+population of a given size over the habitable cells and times a number of
+annual cycles. Every case runs in a fresh process, so the peak memory
+(maximum resident set size) of one case does not include the others.
+
+Results can be saved as a baseline and compared against later runs:
+
+    python benchmarks/suite.py --save-baseline baseline.json
+    python benchmarks/suite.py --baseline baseline.json
+"""
+
+__author__ = "Sara Idris & Thorbjørn L Onsaker, NMBU"
+__email__ = "said@nmbu.no & thon@nmbu.no"
+
+# Name: (rows, columns, number of animals, number of years)
+CASES = {'1e3': (20, 20, 10 ** 3, 20),
+         '1e4': (50, 50, 10 ** 4, 10),
+         '1e5': (150, 150, 10 ** 5, 5),
+         '1e6': (500, 500, 10 ** 6, 3),
+         '1e7': (1500, 1500, 10 ** 7, 2)}
+DEFAULT_CASES = ('1e3', '1e4', '1e5')
+DEFAULT_MIX = {'L': 0.6, 'H': 0.3, 'D': 0.1}
+
+
+def make_island_map(rows, cols, mix=None, seed=0):
+    """Creates a map with random landscape inside a border of water.
+
+    :param rows: number of rows, border included
+    :param cols: number of columns, border included
+    :param mix: dictionary with the share of each landscape letter
+    :param seed: seed for the landscape
+    :returns: multi-line string with the map
+    """
+
+    mix = mix or DEFAULT_MIX
+    rng = np.random.default_rng(seed)
+    letters = np.array(list(mix))
+    share = np.array(list(mix.values()), dtype=float)
+    inner = rng.choice(letters, size=(rows - 2, cols - 2), p=share / share.sum())
+    grid = np.full((rows, cols), 'W')
+    grid[1:-1, 1:-1] = inner
+    return '\n'.join(''.join(row) for row in grid)
+
+
+def populate(island, num_animals, carn_share=0.2, seed=0):
+    """Spreads animals with random age and weight over the habitable cells.
+
+    The stores are filled directly, since creating one object per animal
+    would take longer than the benchmark itself for large populations.
+
+    :param island: RossumIsland to fill
+    :param num_animals: total number of animals
+    :param carn_share: share of the animals that are carnivores
+    :param seed: seed for the population
+    """
+
+    rng = np.random.default_rng(seed)
+    num_carns = int(num_animals * carn_share)
+    for pop, num in ((island.herbs, num_animals - num_carns), (island.carns, num_carns)):
+        pop.add(rng.integers(0, 20, num), rng.uniform(10, 40, num),
+                rng.choice(island.habitable_cells, num))
+
+
+def peak_rss_mb():
+    """Peak memory (maximum resident set size) of this process so far.
+
+    ru_maxrss is in bytes on macOS and in kibibytes on Linux.
+
+    :returns: peak memory in MiB
+    """
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 ** (2 if sys.platform == 'darwin' else 1)
+
+
+def run_case(name, rows, cols, num_animals, num_years, seed=0):
+    """Times the annual cycles of one case.
+
+    The whole years are timed without a phase log, since logging has a cost
+    of its own. The time per phase comes from a second run of the same
+    years with a :class:`biosim.instrumentation.PhaseLog`.
+
+    :returns: dictionary with the results of the case
+    """
+
+    island = RossumIsland(make_island_map(rows, cols, seed=seed), seed=seed)
+    populate(island, num_animals, seed=seed)
+    animal_years = 0
+    start = time.perf_counter()
+    for _ in range(num_years):
+        animal_years += sum(island.get_totals())
+        island.annual_cycle()
+    elapsed = time.perf_counter() - start
+    peak = peak_rss_mb()
+
+    del island
+    island = RossumIsland(make_island_map(rows, cols, seed=seed), seed=seed)
+    populate(island, num_animals, seed=seed)
+    island.phase_log = PhaseLog()
+    for _ in range(num_years):
+        island.annual_cycle()
+    records = island.phase_log.records
+    phases = {phase: float(records['time'][records['phase'] == phase].sum()) / num_years
+              for phase in dict.fromkeys(records['phase'])}
+    return {'case': name, 'rows': rows, 'cols': cols, 'animals': num_animals,
+            'years': num_years, 'seconds': elapsed,
+            'years_per_second': num_years / elapsed,
+            'animal_years_per_second': animal_years / elapsed,
+            'phase_seconds_per_year': phases,
+            'peak_rss_mb': peak}
+
+
+def _run_in_child(args, queue):
+    queue.put(run_case(*args))
+
+
+def run_isolated(name, seed=0):
+    """Runs a case in a fresh process.
+
+    :returns: dictionary with the results of the case
+    """
+
+    context = multiprocessing.get_context('spawn')
+    queue = context.Queue()
+    process = context.Process(target=_run_in_child, args=((name, *CASES[name], seed), queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def compare(results, baseline, tolerance):
+    """Compares throughput with a baseline.
+
+    :param results: list of results
+    :param baseline: list of baseline results
+    :param tolerance: largest allowed relative slowdown
+    :returns: list with a line for each case, and True if any case is slower than allowed
+    """
+
+    old = {result['case']: result for result in baseline}
+    lines = []
+    regression = False
+    for result in results:
+        if result['case'] not in old:
+            continue
+        ratio = result['years_per_second'] / old[result['case']]['years_per_second']
+        slower = ratio < 1 - tolerance
+        regression |= slower
+        lines.append('{:>5}: {:.2f} x baseline{}'.format(result['case'], ratio,
+                                                        '  REGRESSION' if slower else ''))
+    return lines, regression
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cases', nargs='+', choices=list(CASES), default=DEFAULT_CASES)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    parser.add_argument('--save-baseline', metavar='FILE')
+    parser.add_argument('--baseline', metavar='FILE', help='compare against a saved baseline')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='largest allowed slowdown against the baseline (default 0.2)')
+    args = parser.parse_args(argv)
+
+    results = [run_isolated(name, args.seed) for name in args.cases]
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for result in results:
+            print('{case:>5}: {rows}x{cols} cells, {years} years in {seconds:.2f} s, '
+                  '{years_per_second:.2f} years/s, {animal_years_per_second:.3g} animal-years/s, '
+                  'peak {peak_rss_mb:.0f} MB'.format(**result))
+            print('       ' + ', '.join('{} {:.3f}'.format(phase, seconds) for phase, seconds
+                                        in result['phase_seconds_per_year'].items()))
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as file:
+            json.dump(results, file, indent=2)
+    if args.baseline:
+        with open(args.baseline) as file:
+            lines, regression = compare(results, json.load(file), args.tolerance)
+        print('\n'.join(lines))
+        if regression:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,22 +1,60 @@
 from biosim.animals import Herbivore, Carnivore
-from biosim.landscape import Water, Desert, Highland, Lowland, Landscape
+from biosim.instrumentation import PhaseLog
+from biosim.landscape import Water, Desert, Highland, Lowland
+from biosim.kernels import migrate
+from biosim.phases import CellPhases
+from biosim.population import Population
+from biosim.streams import Streams
+from biosim.topology import TOPOLOGIES
+from time import perf_counter
+import numpy as np
 import random
 
 __author__ = "Sara Idris & Thorbjørn L Onsaker, NMBU"
 __email__ = "said@nmbu.no & thon@nmbu.no"
 
 
-class RossumIsland:
-    """Class for the full ecosystem on the island."""
+class RossumIsland(CellPhases):
+    """Class for the full ecosystem on the island.
+
+    The animals are kept in one :class:`biosim.population.Population` store per
+    species, and cells are addressed by their flat index
+    (row * number of columns + column).
+
+    The map is kept as an array of landscape letters, map, with one entry
+    per cell; no landscape objects are created.
+
+    The island owns copies of the animal and landscape parameters, taken from
+    the class defaults when it is created, so islands in the same process do
+    not share parameters.
+
+    Random numbers come from counter-based streams keyed by year, phase and
+    cell, see :class:`biosim.streams.Streams`, so the draws for a cell do not
+    depend on the order the cells are visited in.
+
+    The births, deaths, kills and migrants of the last annual cycle are
+    kept in cycle_counts.
+
+    While a :class:`biosim.parallel.ParallelIsland` holds the animals in its
+    workers, it is the island's holder. The stores, herbs and carns, then
+    take the animals back before they are used, and the totals are counted
+    from the density, which the workers keep up to date.
+    """
 
     island_dict = {'W': Water, 'D': Desert, 'L': Lowland, 'H': Highland}
 
-    def __init__(self, island_map, disease=False):
+    def __init__(self, island_map, disease=False, topology='square', wrap=False, seed=None):
         """
         island_map: string
             Multi-line string with letters representing cells on the island
         disease: bool
             True if the chance for diseases are turned on for the simulation
+        topology: string
+            'square' for four neighbours per cell, 'hexagonal' for six
+        wrap: bool
+            True if the edges of the map wraps around
+        seed: int
+            Seed for the random streams of the island; drawn from the random module if None
         :raises ValueError: if no island map is given, rows in island are not
         of the same length or if island is not surrounded by water.
         """
@@ -26,36 +64,148 @@ class RossumIsland:
         if len(island_map) == 0:
             raise ValueError('No island map was given')
 
-        self.island_row_length = len(island_map.splitlines()[0])
-        self.island_col_length = len(island_map.splitlines())
+        lines = island_map.splitlines()
+        self.island_row_length = len(lines[0])
+        self.island_col_length = len(lines)
 
-        self.island = []
-        for lines in island_map.splitlines():
-            self.island.append(self.splits(lines, self.island_dict))
+        if not set(''.join(lines)) <= set(self.island_dict):
+            raise ValueError('Character not allowed as a part of island map')
 
-        for land_type in self.island[0] + self.island[-1]:
-            if not isinstance(land_type, Water):
-                raise ValueError('Outer edges of map must be water')
+        if set(lines[0] + lines[-1]) != {'W'}:
+            raise ValueError('Outer edges of map must be water')
 
-        for rows in island_map.splitlines():
+        for rows in lines:
             if len(rows) != self.island_row_length:
                 raise ValueError('All rows in the island map must be the same length')
             if not (rows[0] == 'W' or rows[-1] == 'W'):
                 raise ValueError('Outer edges of map must be water')
 
-    @staticmethod
-    def splits(line, island_dict):
-        """Turns characters into landscape objects and splits string into list.
+        self.map = np.frombuffer(''.join(lines).encode('ascii'), dtype='S1').reshape(
+            self.island_col_length, self.island_row_length)
+        letters = self.map.ravel()
+        self.num_cells = self.island_row_length * self.island_col_length
+        if topology not in TOPOLOGIES:
+            raise ValueError('Unknown topology: ' + str(topology))
+        self.topology = TOPOLOGIES[topology](
+            np.isin(letters, [letter.encode() for letter, land_type in self.island_dict.items()
+                              if land_type.is_habitable()]),
+            (self.island_col_length, self.island_row_length), wrap)
+        self.habitable = self.topology.habitable
+        self.fodder = np.zeros(self.num_cells)
+        self.habitable_cells = np.flatnonzero(self.habitable)
+        self.landscape_params = {land_type: dict(land_type.d_landscape)
+                                 for land_type in self.island_dict.values()
+                                 if land_type.d_landscape is not None}
+        self.fodder_cells = {}
+        for letter, land_type in self.island_dict.items():
+            cells = np.flatnonzero(letters == letter.encode())
+            if land_type in self.landscape_params and len(cells) > 0:
+                self.fodder_cells[land_type] = cells
+        self.density = np.zeros((2, self.num_cells), dtype=np.int64)
+        self._herbs = Population(Herbivore, self.num_cells, self.density[0],
+                                 dict(Herbivore.params))
+        self._carns = Population(Carnivore, self.num_cells, self.density[1],
+                                 dict(Carnivore.params))
+        self.holder = None
+        self.streams = Streams(random.getrandbits(64) if seed is None else seed)
+        self.year = 0
+        self.phase_log = None
+        self.cycle_counts = dict.fromkeys(PhaseLog.COUNTERS, 0)
+
+    @property
+    def herbs(self):
+        """Store with the herbivores; taken back from the holder first, if there is one."""
+
+        if self.holder is not None:
+            self.holder.gather()
+        return self._herbs
+
+    @property
+    def carns(self):
+        """Store with the carnivores; taken back from the holder first, if there is one."""
+
+        if self.holder is not None:
+            self.holder.gather()
+        return self._carns
+
+    def set_animal_params(self, species, params):
+        """Overrides the parameters of one species on this island.
+
+        :param species: String, 'Herbivore' or 'Carnivore'
+        :param params: Dict with the parameters to change
+        :raises ValueError: if species is not Herbivore or Carnivore.
+        """
+
+        if species == 'Herbivore':
+            self.herbs.set_params(params)
+        elif species == 'Carnivore':
+            self.carns.set_params(params)
+        else:
+            raise ValueError('Species must be either Carnivore or Herbivore')
 
-        :returns: current fitness for specie
-        :raises ValueError: if character not a part of the island dictionary.
+    def set_landscape_params(self, landscape, params):
+        """Overrides the parameters of one landscape type on this island.
+
+        :param landscape: String, code letter for landscape
+        :param params: Dict with the parameters to change
+        :raises ValueError: if character not a landscape type with parameters,
+                            or if the parameters are not valid.
         """
 
-        for land_type in line:
-            if land_type not in island_dict:
-                raise ValueError('Character not allowed as a part of island map')
+        land_type = self.island_dict.get(landscape)
+        if land_type not in self.landscape_params:
+            raise ValueError(landscape + ' is not a legal landscape type')
+        land_type.check_params(params)
+        self.landscape_params[land_type].update(params)
+
+    def get_state(self):
+        """Everything that changes during a simulation, for a checkpoint.
 
-        return [island_dict[land]() for land in line]
+        The animals are given as columns, the same arrays as in the stores
+        when all animals are alive, so nothing is copied.
+
+        :returns: tuple with a dictionary of arrays and a dictionary of
+                  settings that can be written as JSON
+        """
+
+        columns = {'fodder': self.fodder}
+        for name, pop in (('herb', self.herbs), ('carn', self.carns)):
+            rows = slice(None) if pop.alive.all() else pop.alive
+            columns[name + '_age'] = pop.age[rows]
+            columns[name + '_weight'] = pop.weight[rows]
+            columns[name + '_cell'] = pop.cell[rows]
+        letters = {land_type: letter for letter, land_type in self.island_dict.items()}
+        settings = {'seed': self.streams.seed, 'year': self.year, 'disease': self.disease,
+                    'cycle_counts': {name: int(count) for name, count
+                                     in self.cycle_counts.items()},
+                    'animal_params': {'Herbivore': dict(self.herbs.params),
+                                      'Carnivore': dict(self.carns.params)},
+                    'landscape_params': {letters[land_type]: dict(params) for land_type, params
+                                         in self.landscape_params.items()}}
+        return columns, settings
+
+    def set_state(self, columns, settings):
+        """Restores the state saved by :meth:`get_state` on an island with the same map.
+
+        :param columns: dictionary of arrays from :meth:`get_state`
+        :param settings: dictionary of settings from :meth:`get_state`
+        :raises ValueError: if the fodder does not fit the map
+        """
+
+        if len(columns['fodder']) != self.num_cells:
+            raise ValueError('State does not fit the island map')
+        self.fodder[:] = columns['fodder']
+        for name, pop in (('herb', self.herbs), ('carn', self.carns)):
+            pop.clear()
+            pop.add(columns[name + '_age'], columns[name + '_weight'], columns[name + '_cell'])
+        for species, params in settings['animal_params'].items():
+            self.set_animal_params(species, params)
+        for letter, params in settings['landscape_params'].items():
+            self.set_landscape_params(letter, params)
+        self.streams = Streams(settings['seed'])
+        self.year = settings['year']
+        self.disease = settings['disease']
+        self.cycle_counts = dict(settings['cycle_counts'])
 
     def insert_population(self, pop):
         """Inserts population of given species to given location.
@@ -68,56 +218,72 @@ class RossumIsland:
             location = dic['loc']
             if location[0] <= 0 or location[1] <= 0:
                 raise ValueError('Location coordinates must be positive')
-            try:
-                cell = self.island[location[0] - 1][location[1] - 1]
-                if isinstance(cell, Landscape) and cell.is_habitable():
-                    herbs_list = []
-                    carn_list = []
-                    for animal in dic['pop']:
-                        if animal['species'] == 'Herbivore':
-                            herbs_list.append(Herbivore(animal['age'],
-                                                        animal['weight']))
-                        if animal['species'] == 'Carnivore':
-                            carn_list.append(Carnivore(animal['age'], animal['weight']))
-                    cell.list_herbs.extend(herbs_list)
-                    cell.list_carns.extend(carn_list)
-                else:
-                    raise ValueError('Animals are not allowed to stay at given location')
-            except IndexError:
+            if location[0] > self.island_col_length or location[1] > self.island_row_length:
                 raise ValueError('Specified location does not exist')
+            index = (location[0] - 1) * self.island_row_length + location[1] - 1
+            if not self.habitable[index]:
+                raise ValueError('Animals are not allowed to stay at given location')
+            herbs_list = []
+            carn_list = []
+            for animal in dic['pop']:
+                if animal['species'] == 'Herbivore':
+                    herbs_list.append(Herbivore(animal['age'], animal['weight']))
+                if animal['species'] == 'Carnivore':
+                    carn_list.append(Carnivore(animal['age'], animal['weight']))
+            self.herbs.add([herb.age for herb in herbs_list],
+                           [herb.weight for herb in herbs_list], index)
+            self.carns.add([carn.age for carn in carn_list],
+                           [carn.weight for carn in carn_list], index)
 
     def get_pop_info(self):
         """Get the population density and total sum of animals for each species.
 
+        The densities are read-only views of the count matrix that is kept up
+        to date during the annual cycle, so nothing is counted or copied.
+
         :returns: tuple with 2 dimensional array for herbivore and carnivore
                     density and total number of herbivores and carnivores on the island.
         """
-        herb_array = [[len(cell.list_herbs) for cell in row] for row in self.island]
-        carn_array = [[len(cell.list_carns) for cell in row] for row in self.island]
-        sum_herb = sum([sum(row) for row in herb_array])
-        sum_carn = sum([sum(row) for row in carn_array])
-        return herb_array, carn_array, sum_herb, sum_carn
+
+        shape = (self.island_col_length, self.island_row_length)
+        herb_array = self.density[0].reshape(shape)
+        carn_array = self.density[1].reshape(shape)
+        herb_array.flags.writeable = False
+        carn_array.flags.writeable = False
+        return (herb_array, carn_array) + self.get_totals()
+
+    def get_totals(self):
+        """Get the total number of animals of each species on the island.
+
+        :returns: tuple with number of herbivores and number of carnivores.
+        """
+
+        if self.holder is not None:
+            return tuple(int(count) for count in self.density.sum(axis=1))
+        return len(self._herbs), len(self._carns)
 
     def get_stats(self):
         """Get weight, age and fitness for plotting.
 
-        :returns: tuple with 6 lists containing weights, fitness and ages for
+        :returns: tuple with 6 arrays containing ages, weights and fitness for
                     all herbivores and carnivores on the island.
         """
 
-        age_herbs, age_carns = [], []
-        weight_herbs, weight_carns = [], []
-        fitness_herbs, fitness_carns = [], []
+        herbs = np.flatnonzero(self.herbs.alive)
+        carns = np.flatnonzero(self.carns.alive)
+        return (self.herbs.age[herbs], self.carns.age[carns],
+                self.herbs.weight[herbs], self.carns.weight[carns],
+                self.herbs.get_fitness(herbs), self.carns.get_fitness(carns))
+
+    def get_cell_animals(self, loc):
+        """Herbivore and carnivore objects living in a cell, as a read-only view.
+
+        :param loc: tuple with row and column of the cell, counted from 1
+        :returns: tuple with a list of herbivores and a list of carnivores
+        """
 
-        for row in self.island:
-            for cell in row:
-                age_herbs.extend(cell.get_herb_age())
-                age_carns.extend(cell.get_carn_age())
-                weight_herbs.extend(cell.get_herb_weight())
-                weight_carns.extend(cell.get_carn_weight())
-                fitness_herbs.extend(cell.get_herb_fitness())
-                fitness_carns.extend(cell.get_carn_fitness())
-        return age_herbs, age_carns, weight_herbs, weight_carns, fitness_herbs, fitness_carns
+        index = (loc[0] - 1) * self.island_row_length + loc[1] - 1
+        return self.herbs.animals(index), self.carns.animals(index)
 
     def pyvid(self):
         """checks if pyvid (Pythonvirus disease) occurs or not.
@@ -125,14 +291,23 @@ class RossumIsland:
         :returns: True if pyvid occurs in current year.
         """
 
-        return random.randint(1, 30) == 1
+        return self.streams.stream(self.year, 'pyvid', 0).random() < 1 / 30
+
+    def update_fodder(self):
+        """Updates fodder in the cells with fodder to the value of their landscape type.
+
+        Only Lowland and Highland cells are visited; other cells never have fodder.
+        """
+
+        for land_type, cells in self.fodder_cells.items():
+            self.fodder[cells] = self.landscape_params[land_type]['f_max']
 
     def annual_cycle(self):
         """the annual cycle on the island.
 
         Making one year pass on the island by doing the following missions:
         1.  Update fodder in all habitable cells.
-        2.  Make sure all animals eat or try to eat.
+        2.  Make sure all animals eat or try to eat, herbivores first.
         3.  Procreation for all animals.
         4.  Migration of all animals that will migrate.
         5.  Age all animals.
@@ -144,81 +319,83 @@ class RossumIsland:
         if self.disease:
             pyvid = self.pyvid()
 
-        for row in self.island:
-            for cell in row:
-                if cell.is_habitable():
-                    cell.update_fodder()
-                    if cell.is_populated():
-                        cell.eat_all()
-                        cell.give_birth()
-        self.migration()
-
-        for row in self.island:
-            for cell in row:
-                if cell.is_populated():
-                    cell.ages()
-                    cell.lose_weight(pyvid)
-                    cell.death()
+        self.cycle_counts = dict.fromkeys(PhaseLog.COUNTERS, 0)
+        both = (self.herbs, self.carns)
+        self.run_phase('update_fodder', (), None, self.update_fodder)
+
+        self.run_phase('graze', (self.herbs,), None, self.graze)
+        self.run_phase('hunt', both, 'kills', self.hunt)
+        self.run_phase('herbivore birth', (self.herbs,), 'births', self.give_birth, self.herbs)
+        self.run_phase('carnivore birth', (self.carns,), 'births', self.give_birth, self.carns)
+
+        self.run_phase('migration', both, 'migrants', self.migration)
+        self.run_phase('end_of_year', both, 'deaths', self.end_of_year, pyvid)
+        self.year += 1
+
+    def run_phase(self, name, pops, counter, phase, *args):
+        """Runs a phase of the annual cycle, and adds it to the phase log if there is one.
+
+        The counters the phase returns are added to cycle_counts.
+
+        :param name: name of the phase in the log
+        :param pops: population stores the phase works on
+        :param counter: name of the counter the phase returns, see
+                        :class:`biosim.instrumentation.PhaseLog`; None if it returns none,
+                        or a tuple of names if it returns a dictionary with a count per name
+        :param phase: method that runs the phase
+        :param args: arguments for the method
+        """
+
+        if self.phase_log is None:
+            self._add_counts(counter, phase(*args))
+            return
+        if len(pops) == 0:
+            cells = sum(len(cells) for cells in self.fodder_cells.values())
+        else:
+            cells = len(np.unique(np.concatenate([pop.active for pop in pops])))
+        animals = sum(len(pop) for pop in pops)
+        start = perf_counter()
+        counts = self._add_counts(counter, phase(*args))
+        self.phase_log.add(self.year, name, perf_counter() - start, cells, animals, counts)
+
+    def _add_counts(self, counter, result):
+        """Adds the counters returned by a phase to cycle_counts.
+
+        :param counter: counter argument of :meth:`run_phase`
+        :param result: value returned by the phase
+        :returns: dictionary with a count per counter
+        """
+
+        if counter is None:
+            return {}
+        counts = {counter: result} if isinstance(counter, str) else result
+        for name, count in counts.items():
+            self.cycle_counts[name] += count
+        return counts
 
     def migration(self):
+        """Method for migration for all animals that shall migrate.
+
+        Animals migrates with probability mu * fitness, to one of the
+        neighbour cells in the topology with equal probability, see
+        :func:`biosim.kernels.migrate`. Animals stay if the chosen cell is not
+        habitable. The new cells are written into a second buffer and swapped
+        in when all animals of the species have moved.
+
+        The stores are ordered by cell first, so the order of the animals
+        that arrive in a cell only depends on the cells they come from.
+
+        :returns: number of animals that moved
         """
-        Method for migration for all animals that shall migrate.
-
-        This is done by running the migrate_all method in all cells when iterating
-        through the island. Then the immigrants from the west and north neighbour
-        cell are added to the list of herbivores and carnivores in the main cell.
-        Then the focus is on the "finished_cell" in the upper left corner from the
-        cell we are originally in. All immigrants have migrated from this cell, so
-        the move_lists for herbivores and carnivores are cleared. The last step is
-        to add the immigrants from the south and east neighbour cell to the
-        "finished_cell"(still the west and north cell with respect to the main cell).
-        """
-
-        if not (len(self.island) < 3 or len(self.island[0]) < 3):
-            for row in range(1, len(self.island)):
-                for col in range(1, self.island_row_length):
-                    cell = self.island[row][col]
-                    north = self.island[row - 1][col]
-                    west = self.island[row][col - 1]
-                    if row < len(self.island) - 1 and col < self.island_row_length - 1:
-                        south = self.island[row + 1][col]
-                        east = self.island[row][col + 1]
-                        if cell.is_habitable():
-                            cells_around = (north, south, east, west)
-                            cell.migrate_all(cells_around)
-                            self.move_immigrants_to_cell(cell, north, west)
-                    finished_cell = self.island[row - 1][col - 1]
-                    if finished_cell.is_habitable():
-                        for lst in finished_cell.move_herbs + finished_cell.move_carns:
-                            lst.clear()
-                        self.move_immigrants_to_finished_cell(finished_cell, north, west)
-
-    @staticmethod
-    def move_immigrants_to_cell(main_cell, north, west):
-        """Move immigrants from the north and west neighbour cell into the main cell.
-
-        :param main_cell: cell of specific landscape type.
-        :param north: cell north of the main_cell.
-        :param west: cell west of the main_cell.
-        """
-
-        if north.is_habitable() or west.is_habitable():
-            main_cell.list_herbs.extend(north.move_herbs[1] + west.move_herbs[2])
-            main_cell.list_carns.extend(north.move_carns[1] + west.move_carns[2])
-
-    @staticmethod
-    def move_immigrants_to_finished_cell(finished_cell, north, west):
-        """Move immigrants from the south and east neighbour cell into "finished_cell".
-
-        :param finished_cell: cell of specific landscape type.
-        :param north: cell north of the main_cell, east of finished_cell.
-        :param west: cell west of the main_cell, south of finished_cell.
-
-        finished_cell is the cell in the upper left corner from the main cell
-        (cell[row - 1][col - 1]) The west and north cell with
-        respect to the main cell[row][col]).
-        """
-
-        if north.is_habitable() or west.is_habitable():
-            finished_cell.list_herbs.extend(north.move_herbs[3] + west.move_herbs[0])
-            finished_cell.list_carns.extend(north.move_carns[3] + west.move_carns[0])
+
+        num_moved = 0
+        for pop in (self.herbs, self.carns):
+            pop.sort_by_cell()
+            draws = self.streams.animals(self.year, pop.species.__name__ + ' migration',
+                                         pop.cell)
+            new_cells, moved = migrate(pop.cell, pop.get_fitness(), pop.params,
+                                       self.topology.neighbours, self.topology.allowed,
+                                       draws, out=pop.cell_buffer())
+            pop.swap_cells(new_cells)
+            num_moved += moved
+        return num_moved
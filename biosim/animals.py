@@ -9,6 +9,7 @@ class Animal:
     """Baseclass for animals on the island."""
 
     params = None
+    params_version = 0
 
     @classmethod
     def set_params(cls, new_params):
@@ -19,6 +20,17 @@ class Animal:
         """
 
         cls.params.update(new_params)
+        cls.invalidate_fitness()
+
+    @classmethod
+    def invalidate_fitness(cls):
+        """Flushes cached fitness for all animals of the species.
+
+        Cached values are tagged with params_version, so bumping it
+        makes every animal of the species recompute its fitness.
+        """
+
+        cls.params_version += 1
 
     def __init__(self, age=0, weight=None):
         r"""
@@ -39,6 +51,8 @@ class Animal:
 
         """
 
+        self._fitness = None
+        self._fitness_version = None
         self.age = age
         self.weight = weight
 
@@ -53,6 +67,28 @@ class Animal:
         if self.age < 0:
             raise ValueError('Age of animal must be a non-negative value')
 
+    @property
+    def age(self):
+        """Age of the animal. Setting it clears the cached fitness."""
+
+        return self._age
+
+    @age.setter
+    def age(self, value):
+        self._age = value
+        self._fitness = None
+
+    @property
+    def weight(self):
+        """Weight of the animal. Setting it clears the cached fitness."""
+
+        return self._weight
+
+    @weight.setter
+    def weight(self, value):
+        self._weight = value
+        self._fitness = None
+
     def aging(self):
         """Updates the age with 1 for each year."""
 
@@ -89,18 +125,25 @@ class Animal:
             0 \leq 0 \Phi \leq 1.
             \end{equation}
 
+        The value is cached until age or weight changes, or until
+        the parameters of the species are changed.
+
         :returns: Current fitness for specie.
 
         """
 
-        if self.weight <= 0:
-            return 0
+        if self._fitness is not None and self._fitness_version == self.params_version:
+            return self._fitness
+        if self._weight <= 0:
+            fitness = 0
         else:
             fitness = ((1 / (1 + exp(self.params['phi_age'] *
-                                     (self.age - self.params['a_half'])))) *
+                                     (self._age - self.params['a_half'])))) *
                        (1 / (1 + exp(-self.params['phi_weight'] *
-                                     (self.weight - self.params['w_half'])))))
-            return fitness
+                                     (self._weight - self.params['w_half'])))))
+        self._fitness = fitness
+        self._fitness_version = self.params_version
+        return fitness
 
     def weight_loss(self, pyvid=False, num_animals=None):
         """
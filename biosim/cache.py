@@ -0,0 +1,208 @@
+from biosim.params import SPECIES, default_params
+from biosim.recorder import Recorder
+from biosim.simulation import BioSim
+import hashlib
+import json
+import numpy as np
+import os
+
+__author__ = "Sara Idris & Thorbjørn L Onsaker, NMBU"
+__email__ = "said@nmbu.no & thon@nmbu.no"
+
+SERIES_FILE = 'series.npz'
+
+
+def scenario_params(animal_params=None, landscape_params=None):
+    """Parameters a scenario runs with: the class parameters with the overrides merged in.
+
+    :param animal_params: Dict with parameters per species, e.g. {'Herbivore': {'F': 8}}
+    :param landscape_params: Dict with parameters per landscape code letter
+    :returns: dictionary with a parameter dictionary per species and landscape letter
+    """
+
+    overrides = {**(animal_params or {}), **(landscape_params or {})}
+    return {name: {**params, **overrides.get(name, {})}
+            for name, params in default_params().items()}
+
+
+def scenario_hash(island_map, ini_pop, seed, disease=False, params=None):
+    """Stable hash of everything that decides the result of a simulation.
+
+    :param params: parameters from :func:`scenario_params`; the class
+                   parameters if None
+    :returns: string with the hexadecimal SHA-256 hash
+    """
+
+    scenario = {'version': BioSim.CHECKPOINT_VERSION, 'island_map': island_map,
+                'ini_pop': ini_pop, 'seed': seed, 'disease': disease,
+                'params': scenario_params() if params is None else params}
+    text = json.dumps(scenario, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+class _SeriesRows:
+    """Collects the rows of a :class:`biosim.recorder.Recorder` in memory,
+    without the density columns."""
+
+    def __init__(self):
+        self.rows = []
+
+    def record(self, year, island):
+        self.rows.append(Recorder.row(year, island))
+
+
+class ResultCache:
+    """On-disk cache of checkpoints and yearly time series, keyed by scenario.
+
+    A scenario is the map, initial population, seed, disease and parameters
+    of a simulation, see :func:`scenario_hash`. Each scenario has its own
+    directory with a checkpoint every checkpoint_years years and at the end
+    of each run, see :meth:`biosim.simulation.BioSim.save_checkpoint`, and
+    the time series with the columns of :class:`biosim.recorder.Recorder`
+    for the longest run so far.
+
+    :meth:`run` resumes from the latest checkpoint no later than the
+    requested year, so only the remaining years are simulated. When the
+    files take more than max_bytes, the least recently used checkpoints are
+    removed until they fit; a scenario's time series is removed with its
+    last checkpoint.
+    """
+
+    def __init__(self, directory, max_bytes=10 ** 9, checkpoint_years=100):
+        """
+        :param directory: directory of the cache; created if it does not exist
+        :param max_bytes: largest total size of the files in the cache
+        :param checkpoint_years: years between checkpoints
+        """
+
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.checkpoint_years = checkpoint_years
+        os.makedirs(directory, exist_ok=True)
+
+    def run(self, island_map, ini_pop, seed, num_years, disease=False,
+            animal_params=None, landscape_params=None, **kwargs):
+        """Simulates a scenario up to a year, resuming from the cache where possible.
+
+        :param island_map: Multi-line string specifying island geography
+        :param ini_pop: List of dictionaries specifying initial population
+        :param seed: Integer used as random number seed
+        :param num_years: number of years to simulate
+        :param disease: True to run with pyvid (Pythonvirus disease)
+        :param animal_params: Dict with parameters per species, e.g. {'Herbivore': {'F': 8}}
+        :param landscape_params: Dict with parameters per landscape code letter
+        :param kwargs: other arguments for :class:`biosim.simulation.BioSim`, such as workers
+        :returns: tuple with the BioSim at num_years, and a dictionary with
+                  an array per column of the time series for years 1 to num_years
+        """
+
+        params = scenario_params(animal_params, landscape_params)
+        folder = os.path.join(self.directory,
+                              scenario_hash(island_map, ini_pop, seed, disease, params))
+        os.makedirs(folder, exist_ok=True)
+        series = self._load_series(folder)
+        num_rows = len(series['year'])
+        start = max((year for year in self._checkpoints(folder)
+                     if year <= min(num_years, num_rows)), default=0)
+
+        if start > 0:
+            checkpoint = self._checkpoint_file(folder, start)
+            os.utime(checkpoint)
+            sim = BioSim.load_checkpoint(checkpoint, **kwargs)
+        else:
+            sim = BioSim(island_map, ini_pop, seed, disease=disease, **kwargs)
+            for name, values in params.items():
+                if name in SPECIES:
+                    sim.set_animal_parameters(name, values)
+                else:
+                    sim.set_landscape_parameters(name, values)
+        prefix = {name: column[:start] for name, column in series.items()}
+
+        rows = _SeriesRows()
+        for record in sim.iter_years(num_years - start, recorder=rows):
+            if record.year % self.checkpoint_years == 0 or record.year == num_years:
+                self._save(folder, sim, prefix, rows.rows, num_rows)
+        result = self._join(prefix, rows.rows)
+        self._evict()
+        return sim, result
+
+    @staticmethod
+    def _checkpoint_file(folder, year):
+        return os.path.join(folder, '{:010d}.npz'.format(year))
+
+    @staticmethod
+    def _checkpoints(folder):
+        """Years with a checkpoint in a scenario directory."""
+
+        return [int(name[:-4]) for name in os.listdir(folder)
+                if name.endswith('.npz') and name[:-4].isdigit()]
+
+    @staticmethod
+    def _load_series(folder):
+        """Time series of a scenario, with no rows if there is none."""
+
+        path = os.path.join(folder, SERIES_FILE)
+        if not os.path.exists(path):
+            return {name: np.empty(0, dtype=np.int64) for name in Recorder.COLUMNS}
+        os.utime(path)
+        with np.load(path, allow_pickle=False) as data:
+            return {name: data[name] for name in Recorder.COLUMNS}
+
+    @staticmethod
+    def _join(prefix, rows):
+        """Cached columns followed by the rows of this run."""
+
+        new = np.array(rows, dtype=np.int64).reshape(-1, len(Recorder.COLUMNS))
+        return {name: np.concatenate((prefix[name], new[:, column]))
+                for column, name in enumerate(Recorder.COLUMNS)}
+
+    def _save(self, folder, sim, prefix, rows, num_rows):
+        """Saves a checkpoint of the simulation, and the time series if it is longer than before.
+
+        Files are written under a temporary name and then renamed, so a run
+        that is stopped while writing leaves no broken files.
+        """
+
+        path = self._checkpoint_file(folder, sim.year)
+        sim.save_checkpoint(path + '.tmp')
+        os.replace(path + '.tmp', path)
+        if sim.year > num_rows:
+            path = os.path.join(folder, SERIES_FILE)
+            with open(path + '.tmp', 'wb') as file:
+                np.savez(file, **self._join(prefix, rows))
+            os.replace(path + '.tmp', path)
+
+    def _folders(self):
+        """Directories of the scenarios in the cache; other entries are skipped."""
+
+        return [entry.path for entry in os.scandir(self.directory) if entry.is_dir()]
+
+    def size(self):
+        """Total size of the files of the scenarios in the cache, in bytes."""
+
+        return sum(entry.stat().st_size for folder in self._folders()
+                   for entry in os.scandir(folder) if entry.is_file())
+
+    def _evict(self):
+        """Removes the least recently used checkpoints until the cache fits in max_bytes."""
+
+        total = self.size()
+        if total <= self.max_bytes:
+            return
+        checkpoints = sorted(
+            (os.path.getmtime(path), path) for path in
+            (self._checkpoint_file(folder, year)
+             for folder in self._folders() for year in self._checkpoints(folder)))
+        for _, path in checkpoints:
+            if total <= self.max_bytes:
+                break
+            total -= os.path.getsize(path)
+            os.remove(path)
+            folder = os.path.dirname(path)
+            if len(self._checkpoints(folder)) == 0:
+                for entry in list(os.scandir(folder)):
+                    if entry.is_file():
+                        total -= entry.stat().st_size
+                        os.remove(entry.path)
+                if len(os.listdir(folder)) == 0:
+                    os.rmdir(folder)
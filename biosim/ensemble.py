@@ -0,0 +1,125 @@
+from biosim.params import SPECIES, default_params
+from biosim.simulation import BioSim
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+__author__ = "Sara Idris & Thorbjørn L Onsaker, NMBU"
+__email__ = "said@nmbu.no & thon@nmbu.no"
+
+
+def _run_seed(task):
+    """Runs one simulation of a scenario.
+
+    The simulation gets the base parameters from the parent process and the
+    overrides of the scenario as its own parameters, so the result only
+    depends on the scenario and the seed.
+
+    :param task: tuple with the scenario, its base parameters and the seed
+    :returns: tuple with arrays of yearly herbivore and carnivore counts
+    """
+
+    scenario, base_params, seed = task
+    sim = BioSim(scenario.island_map, scenario.ini_pop, seed, disease=scenario.disease)
+    for name, params in base_params.items():
+        if name in SPECIES:
+            sim.set_animal_parameters(name, {**params, **scenario.animal_params.get(name, {})})
+        else:
+            sim.set_landscape_parameters(name, {**params,
+                                                **scenario.landscape_params.get(name, {})})
+    counts = np.array([(record.num_herbivores, record.num_carnivores)
+                       for record in sim.iter_years(scenario.num_years)],
+                      dtype=np.int64).reshape(-1, 2)
+    return counts[:, 0], counts[:, 1]
+
+
+class Ensemble:
+    """Runs the same scenario with many seeds, in parallel processes.
+
+    Each run is independent and seeded only by its own seed, so the results
+    are the same whatever the number of worker processes.
+    """
+
+    def __init__(self, island_map, ini_pop, num_years, animal_params=None,
+                 landscape_params=None, disease=False):
+        """
+        :param island_map: Multi-line string specifying island geography
+        :param ini_pop: List of dictionaries specifying initial population
+        :param num_years: number of years to simulate in each run
+        :param animal_params: Dict with parameters per species, e.g.
+                {'Herbivore': {'F': 8}}
+        :param landscape_params: Dict with parameters per landscape code letter,
+                e.g. {'L': {'f_max': 700}}
+        :param disease: True to run with pyvid (Pythonvirus disease)
+        """
+
+        self.island_map = island_map
+        self.ini_pop = ini_pop
+        self.num_years = num_years
+        self.animal_params = animal_params or {}
+        self.landscape_params = landscape_params or {}
+        self.disease = disease
+
+    def run(self, seeds, workers=None):
+        """Runs the scenario once for each seed.
+
+        The class-level parameters at the time of the call are used as base
+        for all runs, also in worker processes that were started earlier.
+
+        :param seeds: list of integer seeds
+        :param workers: number of worker processes; all cores if None,
+                and no pool is started if 1
+        :returns: EnsembleResult with yearly counts for each seed
+        """
+
+        base_params = default_params()
+        tasks = [(self, base_params, seed) for seed in seeds]
+        if workers == 1:
+            results = [_run_seed(task) for task in tasks]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(_run_seed, tasks))
+        return EnsembleResult(seeds, results, self.num_years)
+
+
+class EnsembleResult:
+    """Yearly animal counts from an ensemble run.
+
+        seeds: list
+            Seed of each run, in the order of the rows in the counts.
+        years: numpy array
+            Year of each column in the counts.
+        counts: dictionary
+            Array with shape (number of seeds, number of years) for each species.
+    """
+
+    def __init__(self, seeds, results, num_years):
+        """
+        :param seeds: list of seeds
+        :param results: tuple of herbivore and carnivore counts for each seed
+        :param num_years: number of years in each run
+        """
+
+        self.seeds = list(seeds)
+        self.years = np.arange(1, num_years + 1)
+        self.counts = {species: np.array([result[i] for result in results],
+                                         dtype=np.int64).reshape(len(self.seeds), num_years)
+                       for i, species in enumerate(SPECIES)}
+
+    def mean(self, species):
+        """Mean count across the seeds for each year.
+
+        :param species: String, name of animal species
+        :returns: array with one value per year
+        """
+
+        return self.counts[species].mean(axis=0)
+
+    def quantile(self, q, species):
+        """Quantiles of the count across the seeds for each year.
+
+        :param q: quantile or sequence of quantiles between 0 and 1
+        :param species: String, name of animal species
+        :returns: array with one value per year, or one row per quantile
+        """
+
+        return np.quantile(self.counts[species], q, axis=0)
@@ -1,8 +1,4 @@
-import matplotlib.pyplot as plt
 import numpy as np
-import subprocess
-import matplotlib.patches as mpatches
-from matplotlib.widgets import Button
 
 __author__ = "Sara Idris & Thorbjørn L Onsaker, NMBU"
 __email__ = "said@nmbu.no & thon@nmbu.no"
@@ -16,6 +12,22 @@ _DEFAULT_GRAPHICS_NAME = 'bs'
 _DEFAULT_IMG_FORMAT = 'png'
 _DEFAULT_MOVIE_FORMAT = 'mp4'
 
+# matplotlib modules, imported by _load_matplotlib() when graphics are set up
+plt = None
+mpatches = None
+Button = None
+
+
+def _load_matplotlib():
+    """Imports matplotlib on first use, so importing this module stays cheap."""
+
+    global plt, mpatches, Button
+    if plt is None:
+        import matplotlib.pyplot
+        import matplotlib.patches
+        from matplotlib.widgets import Button as button
+        plt, mpatches, Button = matplotlib.pyplot, matplotlib.patches, button
+
 
 class Graphics:
     """Class providing graphics support for BioSim class."""
@@ -98,6 +110,8 @@ class Graphics:
         The movie is stored as img_base + movie_fmt
         """
 
+        import subprocess
+
         if self._img_base is None:
             raise RuntimeError("No filename defined.")
 
@@ -130,6 +144,7 @@ class Graphics:
     def setup(self, final_year, img_years, island_map):
         """Prepare graphics."""
 
+        _load_matplotlib()
         self._img_years = img_years
 
         if self._fig is None:
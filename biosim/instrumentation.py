@@ -0,0 +1,79 @@
+import numpy as np
+
+__author__ = "Sara Idris & Thorbjørn L Onsaker, NMBU"
+__email__ = "said@nmbu.no & thon@nmbu.no"
+
+
+class PhaseLog:
+    """Wall time and counters for each phase of each annual cycle.
+
+    One row is added per phase and year, with the fields
+
+        year: int
+            Number of annual cycles run before this one.
+        phase: str
+            Name of the phase.
+        time: float
+            Wall time of the phase in seconds.
+        cells: int
+            Cells visited: cells with animals of the species the phase
+            works on, or the cells with fodder for the fodder update.
+        animals: int
+            Animals of the species the phase works on, before the phase.
+        births, deaths, kills, migrants: int
+            Number of animals born, dead, killed by carnivores and moved.
+    """
+
+    DTYPE = np.dtype([('year', np.int64), ('phase', 'U24'), ('time', np.float64),
+                      ('cells', np.int64), ('animals', np.int64), ('births', np.int64),
+                      ('deaths', np.int64), ('kills', np.int64), ('migrants', np.int64)])
+    COUNTERS = ('births', 'deaths', 'kills', 'migrants')
+
+    def __init__(self):
+        self._rows = []
+
+    def __len__(self):
+        return len(self._rows)
+
+    def add(self, year, phase, time, cells, animals, counts=None):
+        """Adds the row of one phase.
+
+        :param counts: dictionary with the value of each counter the phase
+                       reports, see COUNTERS; None if it reports none
+        """
+
+        counts = counts or {}
+        self._rows.append((year, phase, time, cells, animals)
+                          + tuple(counts.get(name, 0) for name in self.COUNTERS))
+
+    @property
+    def records(self):
+        """All rows as a numpy structured array with the fields in DTYPE."""
+
+        return np.array(self._rows, dtype=self.DTYPE)
+
+    def summary(self):
+        """Sum of time and counters for each phase, over all years.
+
+        :returns: dictionary with a dictionary of sums for each phase
+        """
+
+        records = self.records
+        return {phase: {field: records[field][records['phase'] == phase].sum()
+                        for field in ('time', 'animals') + self.COUNTERS}
+                for phase in dict.fromkeys(records['phase'])}
+
+    def save(self, filename):
+        """Saves the rows to a CSV file, or a NPZ file with one array per field.
+
+        :param filename: name of the file; ends with '.npz' for NPZ, else CSV
+        """
+
+        records = self.records
+        if str(filename).endswith('.npz'):
+            np.savez(filename, **{name: records[name] for name in self.DTYPE.names})
+            return
+        with open(filename, 'w') as file:
+            file.write(','.join(self.DTYPE.names) + '\n')
+            for row in records.tolist():
+                file.write(','.join(str(value) for value in row) + '\n')
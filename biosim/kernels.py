@@ -0,0 +1,277 @@
+from biosim.streams import animal_draws
+from math import exp
+import numpy as np
+import random
+
+__author__ = "Sara Idris & Thorbjørn L Onsaker, NMBU"
+__email__ = "said@nmbu.no & thon@nmbu.no"
+
+
+def fitness(age, weight, params):
+    r"""Calculate fitness for arrays of ages and weights.
+
+    Same formula as :meth:`biosim.animals.Animal.get_fitness`, evaluated for
+    many animals at once. Animals with weight :math:`w \leq 0` get fitness 0.
+
+    :param age: ages of the animals
+    :param weight: weights of the animals
+    :param params: parameter dictionary for the species
+    :returns: array with fitness for each animal
+    """
+
+    age = np.asarray(age, dtype=float)
+    weight = np.asarray(weight, dtype=float)
+    with np.errstate(over='ignore'):
+        phi = ((1 / (1 + np.exp(params['phi_age'] * (age - params['a_half'])))) *
+               (1 / (1 + np.exp(-params['phi_weight'] * (weight - params['w_half'])))))
+    return np.where(weight > 0, phi, 0.0)
+
+
+def graze(cell, fodder, params, rng):
+    """Lets the herbivores eat fodder, in random order within each cell.
+
+    Gives the same result as letting the herbivores in a cell eat one by one,
+    each eating min(F, remaining fodder), but for all herbivores on the island
+    in one step: one permutation is drawn, and each herbivore gets what is left
+    of the cell's fodder after the cumulative appetite of those before it.
+
+    :param cell: cell index of each herbivore
+    :param fodder: available fodder per cell; reduced in place
+    :param params: herbivore parameters
+    :param rng: numpy random generator, or
+                :class:`biosim.streams.AnimalStreams` for the herbivores
+    :returns: array with the amount of fodder eaten by each herbivore
+    """
+
+    cell = np.asarray(cell)
+    order = animal_draws(rng, len(cell)).permutation()
+    order = order[np.argsort(cell[order], kind='stable')]
+    sorted_cells = cell[order]
+    rank = np.arange(len(cell)) - np.searchsorted(sorted_cells, sorted_cells, side='left')
+    eaten = np.empty(len(cell))
+    eaten[order] = np.clip(fodder[sorted_cells] - rank * params['F'], 0, params['F'])
+    cells, num = np.unique(sorted_cells, return_counts=True)
+    fodder[cells] = np.maximum(fodder[cells] - num * params['F'], 0)
+    return eaten
+
+
+def truncated_normal(mean, sd, size, rng):
+    """Draws from a normal distribution truncated to positive values.
+
+    Non-positive values are drawn again until all values are positive.
+
+    :param mean: mean of the normal distribution
+    :param sd: standard deviation of the normal distribution
+    :param size: number of values
+    :param rng: numpy random generator, or
+                :class:`biosim.streams.AnimalStreams` with size animals
+    :returns: array with positive values
+    """
+
+    draws = animal_draws(rng, size)
+    values = draws.normal(mean, sd)
+    redraw = np.flatnonzero(values <= 0)
+    while len(redraw) > 0:
+        values[redraw] = draws.normal(mean, sd, redraw)
+        redraw = redraw[values[redraw] <= 0]
+    return values
+
+
+def birth(weight, fitness, num_in_cell, params, rng):
+    r"""Decides which animals give birth, and the weight of each offspring.
+
+    Same rules as :meth:`biosim.animals.Animal.mate`, for many animals at once.
+    An animal gives birth with probability
+
+    .. math::
+
+        \begin{equation}
+        min(1, \gamma \times \Phi \times (N-1))
+        \end{equation}
+
+    if its weight is at least :math:`\zeta (w_{birth} + \sigma_{birth})`.
+    The offspring weights are drawn from a truncated normal distribution
+    in one call, and a birth only happens if the mother weighs at least
+    :math:`\xi` times the offspring.
+
+    :param weight: weights of the animals
+    :param fitness: fitness of the animals
+    :param num_in_cell: number of animals of the same species in each animal's cell
+    :param params: parameters of the species
+    :param rng: numpy random generator, or
+                :class:`biosim.streams.AnimalStreams` for the animals
+    :returns: tuple with indices of the mothers and the weights of their offsprings
+    """
+
+    weight = np.asarray(weight)
+    draws = animal_draws(rng, len(weight))
+    prob = np.minimum(1, params['gamma'] * np.asarray(fitness) * (np.asarray(num_in_cell) - 1))
+    ready = weight >= params['zeta'] * (params['w_birth'] + params['sigma_birth'])
+    mothers = np.flatnonzero(ready & (draws.random() < prob))
+    offspring = truncated_normal(params['w_birth'], params['sigma_birth'], len(mothers),
+                                 draws.subset(mothers))
+    can_carry = weight[mothers] >= params['xi'] * offspring
+    return mothers[can_carry], offspring[can_carry]
+
+
+def end_of_year(age, weight, num_in_cell, params, rng, pyvid=False):
+    r"""Ages the animals, reduces their weight and decides which animals die.
+
+    Same rules as :meth:`biosim.animals.Animal.aging`,
+    :meth:`biosim.animals.Animal.weight_loss` and
+    :meth:`biosim.animals.Animal.dies`, done in one pass: each animal loses
+    eta * its weight, or half its weight if it is infected with pyvid, and
+    dies with certainty if :math:`w \leq 0` and otherwise with probability
+    :math:`\omega(1-\Phi)`.
+
+    :param age: ages of the animals; increased by 1 in place
+    :param weight: weights of the animals; reduced in place
+    :param num_in_cell: number of animals of both species in each animal's cell
+    :param params: parameters of the species
+    :param rng: numpy random generator, or
+                :class:`biosim.streams.AnimalStreams` for the animals
+    :param pyvid: True if this is a year with pyvid (Pythonvirus disease)
+    :returns: tuple with the new fitness and a boolean array that is True for animals that die
+    """
+
+    draws = animal_draws(rng, len(weight))
+    age += 1
+    loss = np.full(len(weight), params['eta'])
+    if pyvid:
+        loss[draws.random() < 0.02 * np.asarray(num_in_cell)] = 0.5
+    weight -= loss * weight
+    phi = fitness(age, weight, params)
+    dies = (weight <= 0) | (draws.random() < params['omega'] * (1 - phi))
+    return phi, dies
+
+
+def migrate(cell, fitness, params, neighbours, allowed, rng, out=None):
+    """Moves animals to neighbour cells.
+
+    All migrate decisions (probability mu * fitness) and directions (one of
+    the neighbour slots of the cell, with equal probability) are drawn as
+    arrays. Moves that are not allowed, off the map or into cells that are
+    not habitable, are rejected, and the animal stays. The new cells are
+    scattered into ``out``, so the current cells are only read while the
+    next state is written.
+
+    :param cell: current cell ID of each animal
+    :param fitness: fitness of each animal
+    :param params: parameters of the species
+    :param neighbours: neighbour table, see :class:`biosim.topology.Topology`
+    :param allowed: boolean table, True where a move to the neighbour is allowed
+    :param rng: numpy random generator, or
+                :class:`biosim.streams.AnimalStreams` for the animals
+    :param out: array to write the new cells into; allocated if None
+    :returns: tuple with the new cells and the number of animals that moved
+    """
+
+    if out is None:
+        out = np.empty_like(cell)
+    draws = animal_draws(rng, len(cell))
+    movers = np.flatnonzero(draws.random() < params['mu'] * np.asarray(fitness))
+    origin = cell[movers]
+    direction = draws.integers(neighbours.shape[1], movers)
+    moves = allowed[origin, direction]
+    out[:] = cell
+    out[movers[moves]] = neighbours[origin[moves], direction[moves]]
+    return out, int(moves.sum())
+
+
+def predation(carn_age, carn_weight, herb_fitness, herb_weight, params, rng, chunk=128):
+    r"""Lets all carnivores in a cell hunt the herbivores in the cell.
+
+    Follows the same rules as :meth:`biosim.animals.Carnivore.consumed_herbs`:
+    carnivores hunt one by one from the highest fitness, and each carnivore
+    tries the herbivores from the lowest fitness and up. A herbivore is
+    killed with probability
+
+    .. math::
+
+        \begin{equation}
+        p = min(1, \frac{\Phi_{carn}-\Phi_{herb}}{\Delta\Phi_{max}})
+        \end{equation}
+
+    until the carnivore has eaten F or meets a herbivore with a fitness
+    equal to or higher than its own. The fitness of the carnivore is updated
+    after each kill.
+
+    The herbivores are sorted once, killed herbivores are masked out instead
+    of removed, and the random numbers are drawn in blocks of ``chunk``
+    herbivores at a time.
+
+    :param carn_age: ages of the carnivores
+    :param carn_weight: weights of the carnivores
+    :param herb_fitness: fitness of the herbivores
+    :param herb_weight: weights of the herbivores
+    :param params: carnivore parameters
+    :param rng: numpy random generator, or :class:`biosim.streams.CellStream`
+                for the cell
+    :param chunk: number of herbivores drawn for at a time
+    :returns: tuple with new carnivore weights and a boolean array that is
+              True for killed herbivores
+    """
+
+    carn_age = np.asarray(carn_age)
+    carn_weight = np.array(carn_weight, dtype=float)
+    herb_fitness = np.asarray(herb_fitness, dtype=float)
+    killed = np.zeros(len(herb_fitness), dtype=bool)
+    if len(carn_weight) == 0 or len(herb_fitness) == 0:
+        return carn_weight, killed
+
+    herb_order = np.argsort(herb_fitness, kind='stable')
+    sorted_fitness = herb_fitness[herb_order]
+    sorted_weight = np.asarray(herb_weight, dtype=float)[herb_order]
+    live = np.ones(len(herb_order), dtype=bool)
+    carn_fitness = fitness(carn_age, carn_weight, params)
+
+    for carn in np.argsort(-carn_fitness, kind='stable'):
+        age_factor = 1 / (1 + exp(params['phi_age'] * (carn_age[carn] - params['a_half'])))
+        phi = carn_fitness[carn]
+        wanted_food = params['F']
+        start = 0
+        while wanted_food > 0:
+            end = np.searchsorted(sorted_fitness, phi, side='left')
+            herb = _first_kill(phi, sorted_fitness, live, start, end,
+                               params['DeltaPhiMax'], rng, chunk)
+            if herb is None:
+                break
+            live[herb] = False
+            eaten = min(wanted_food, sorted_weight[herb])
+            carn_weight[carn] += params['beta'] * eaten
+            wanted_food -= eaten
+            phi = age_factor / (1 + exp(-params['phi_weight'] *
+                                        (carn_weight[carn] - params['w_half'])))
+            start = herb + 1
+
+    killed[herb_order] = ~live
+    return carn_weight, killed
+
+
+def _first_kill(phi, sorted_fitness, live, start, end, delta_phi_max, rng, chunk):
+    """Finds the first herbivore in start:end that a carnivore with fitness phi kills.
+
+    :returns: index of the killed herbivore, or None if no herbivore is killed
+    """
+
+    pos = start
+    while pos < end:
+        stop = min(pos + chunk, end)
+        block = pos + np.flatnonzero(live[pos:stop])
+        if len(block) > 0:
+            p = np.minimum(1, (phi - sorted_fitness[block]) / delta_phi_max)
+            hits = np.flatnonzero(rng.random(len(block)) < p)
+            if len(hits) > 0:
+                return block[hits[0]]
+        pos = stop
+    return None
+
+
+def default_rng():
+    """Numpy random generator seeded from the random module.
+
+    Lets random.seed() control the kernels when they are used through
+    the Landscape objects.
+    """
+
+    return np.random.default_rng(random.getrandbits(64))
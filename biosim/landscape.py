@@ -1,3 +1,5 @@
+from biosim.kernels import birth, graze, predation, default_rng
+import numpy as np
 import random
 
 __author__ = "Sara Idris & Thorbjørn L Onsaker, NMBU"
@@ -34,6 +36,20 @@ class Landscape:
                             value is negative.
         """
 
+        cls.check_params(new_params)
+        cls.d_landscape.update(new_params)
+
+    @classmethod
+    def check_params(cls, new_params):
+        """Checks new parameters without setting them.
+
+        :param new_params: new input parameters
+
+        :raises ValueError: if key not an original key in landscape parameters,
+                            new value not an integer or float or if fodder
+                            value is negative.
+        """
+
         for key in new_params:
             if key not in cls.d_landscape:
                 raise ValueError('Invalid parameter name:' + key)
@@ -41,7 +57,6 @@ class Landscape:
                 raise ValueError(key + ' must be of type integer or float')
             if new_params[key] < 0:
                 raise ValueError('Fodder value must be positive')
-        cls.d_landscape.update(new_params)
 
     def __init__(self):
 
@@ -63,32 +78,38 @@ class Landscape:
 
         self.fodder = 0
 
-    def eat_all(self):
+    def eat_all(self, rng=None):
         """Feed all animals in the cell.
 
-        Herbivores eats in random order.
-        Carnivores eats in order based on fitness. In the end,
-        the eaten herbivores are removed, and the survivors
-        are stored in list_herbs.
+        Herbivores eats in random order, see :func:`biosim.kernels.graze`.
+        Carnivores eats in order based on fitness, see
+        :func:`biosim.kernels.predation`. In the end, the eaten
+        herbivores are removed from list_herbs.
+
+        :param rng: numpy random generator; seeded from the random module if None
         """
 
-        if not len(self.list_herbs) == 0:
-            random.shuffle(self.list_herbs)
-            for herb in self.list_herbs:
-                if self.fodder > 0:
-                    self.set_fodder(self.fodder - herb.consumed_fodder(self.fodder))
-                else:
-                    break
-        if not len(self.list_carns) == 0:
-            sorted_carns = sorted(self.list_carns, key=lambda x: x.get_fitness(), reverse=True)
-            sorted_herbs = sorted(self.list_herbs, key=lambda x: x.get_fitness())
-            for carn in sorted_carns:
-                killed_herbs = carn.consumed_herbs(sorted_herbs)
-                if len(killed_herbs) == 0:
-                    continue
-                for herb in killed_herbs:
-                    sorted_herbs.remove(herb)
-            self.list_herbs = sorted_herbs
+        if rng is None:
+            rng = default_rng()
+        if not len(self.list_herbs) == 0 and self.fodder > 0:
+            params = self.list_herbs[0].params
+            fodder = np.array([self.fodder], dtype=float)
+            eaten = graze(np.zeros(len(self.list_herbs), dtype=int), fodder, params, rng)
+            for herb, amount in zip(self.list_herbs, eaten):
+                if amount > 0:
+                    herb.weight += params['beta'] * amount
+            self.set_fodder(float(fodder[0]))
+        if not (len(self.list_carns) == 0 or len(self.list_herbs) == 0):
+            carn_weight, killed = predation([carn.age for carn in self.list_carns],
+                                            [carn.weight for carn in self.list_carns],
+                                            self.get_herb_fitness(),
+                                            self.get_herb_weight(),
+                                            self.list_carns[0].params, rng)
+            for carn, weight in zip(self.list_carns, carn_weight):
+                if weight != carn.weight:
+                    carn.weight = weight
+            self.list_herbs = [herb for herb, dead in zip(self.list_herbs, killed)
+                               if not dead]
 
     def migrate_all(self, cells_around):
         """Decide what neighbour cell the animal will migrate to if it migrates.
@@ -125,34 +146,35 @@ class Landscape:
                     carns_stay.append(carn)
             self.list_carns = carns_stay
 
-    def give_birth(self):
+    def give_birth(self, rng=None):
         """Appends all the offsprings to the cell population for animals that give birth.
 
-        Calls :meth: 'mate()' and checks if animal gets offspring, puts offspring into new list
+        Animals give birth to an offspring of the same specie with the
+        rules in :meth:`biosim.animals.Animal.mate`. The decisions and the
+        offspring weights are drawn for the whole cell at once, see
+        :func:`biosim.kernels.birth`, and the offsprings are appended in bulk.
 
-        Animals give birth to an offspring of the same specie if mate method is fulfilled.
+        :param rng: numpy random generator; seeded from the random module if None
         """
 
-        if len(self.list_herbs) > 1:
-            offspring_herbs = []
-            for herb in self.list_herbs:
-                offspring = herb.mate(len(self.list_herbs))
-                if offspring:
-                    offspring_herbs.append(offspring)
-            self.list_herbs.extend(offspring_herbs)
-        if len(self.list_carns) > 1:
-            offspring_carns = []
-            for carn in self.list_carns:
-                offspring = carn.mate(len(self.list_carns))
-                if offspring:
-                    offspring_carns.append(offspring)
-            self.list_carns.extend(offspring_carns)
+        if rng is None:
+            rng = default_rng()
+        for animals in (self.list_herbs, self.list_carns):
+            if len(animals) > 1:
+                params = animals[0].params
+                mothers, offspring = birth([animal.weight for animal in animals],
+                                           [animal.get_fitness() for animal in animals],
+                                           len(animals), params, rng)
+                for mother, weight in zip(mothers, offspring):
+                    animals[mother].weight -= params['xi'] * weight
+                animals.extend([type(animals[0])(0, float(weight)) for weight in offspring])
 
     def ages(self):
         """Species ages by one year each year."""
 
-        for animal in (self.list_herbs + self.list_carns):
-            animal.aging()
+        for animals in (self.list_herbs, self.list_carns):
+            for animal in animals:
+                animal.aging()
 
     def death(self):
         """Keeps animal if it don't die in method dies()."""
@@ -166,8 +188,10 @@ class Landscape:
         :param pyvid: True if this is a year with pyvid (Pythonvirus disease).
         """
 
-        for animal in (self.list_herbs + self.list_carns):
-            animal.weight_loss(pyvid, len(self.list_herbs + self.list_carns))
+        num_animals = len(self.list_herbs) + len(self.list_carns)
+        for animals in (self.list_herbs, self.list_carns):
+            for animal in animals:
+                animal.weight_loss(pyvid, num_animals)
 
     def set_fodder(self, fodder):
         """Sets new fodder value."""
@@ -180,7 +204,7 @@ class Landscape:
         :returns: True if cell is populated.
         """
 
-        return len(self.list_herbs + self.list_carns) > 0
+        return len(self.list_herbs) > 0 or len(self.list_carns) > 0
 
     def get_herb_fitness(self):
         """Returns fitness of all herbivores in the cell as list."""
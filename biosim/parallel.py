@@ -0,0 +1,500 @@
+from biosim.animals import Herbivore, Carnivore
+from biosim.instrumentation import PhaseLog
+from biosim.kernels import migrate
+from biosim.phases import CellPhases
+from biosim.population import Population
+from biosim.streams import Streams
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import shared_memory
+from time import perf_counter
+import numpy as np
+import os
+import pickle
+
+__author__ = "Sara Idris & Thorbjørn L Onsaker, NMBU"
+__email__ = "said@nmbu.no & thon@nmbu.no"
+
+# Shared arrays, neighbour tables and resident strips of a worker process, set by _attach()
+_worker = {}
+
+
+def _attach(fodder_name, density_name, num_cells, neighbours, allowed):
+    """Attaches a worker process to the shared fodder and density arrays.
+
+    :param fodder_name: name of the shared memory block with the fodder
+    :param density_name: name of the shared memory block with the density
+    :param num_cells: number of cells on the island
+    :param neighbours: neighbour table of the island, see :class:`biosim.topology.Topology`
+    :param allowed: boolean table, True where a move to the neighbour is allowed
+    """
+
+    memory = [shared_memory.SharedMemory(name=name) for name in (fodder_name, density_name)]
+    _worker.update(memory=memory, strips={}, topology=(neighbours, allowed),
+                   fodder=np.ndarray(num_cells, dtype=np.float64, buffer=memory[0].buf),
+                   density=np.ndarray((2, num_cells), dtype=np.int64, buffer=memory[1].buf))
+
+
+class Strip(CellPhases):
+    """The animals and fodder in a strip of rows, with cells counted from the start of the strip.
+
+    Runs the phases of :class:`biosim.phases.CellPhases` for the strip only.
+    Random numbers come from the same streams as for the whole island, so
+    the result is the same as when the whole island is run at once. The
+    strip stays in its worker from year to year; only the animals that
+    leave or enter it are sent between the workers.
+    """
+
+    def __init__(self, start, stop, fodder, density, seed, params, herbs, carns):
+        """
+        :param start: first cell of the strip
+        :param stop: cell after the last cell of the strip
+        :param fodder: fodder array of the whole island; the strip's part is changed in place
+        :param density: count matrix of the whole island; the strip's part is kept up to date
+        :param seed: seed of the island's random streams
+        :param params: tuple with herbivore and carnivore parameters
+        :param herbs: tuple with ages, weights and island cells of the herbivores in the strip
+        :param carns: tuple with ages, weights and island cells of the carnivores in the strip
+        """
+
+        self.start = start
+        self.stop = stop
+        self.fodder = fodder[start:stop]
+        self.streams = Streams(seed, offset=start)
+        self.year = 0
+        self.herbs = Population(Herbivore, stop - start, density[0, start:stop],
+                                dict(params[0]))
+        self.carns = Population(Carnivore, stop - start, density[1, start:stop],
+                                dict(params[1]))
+        for pop, (ages, weights, cells) in ((self.herbs, herbs), (self.carns, carns)):
+            pop.add(ages, weights, cells - start)
+
+    def census(self):
+        """Number of cells with animals and number of animals in the strip."""
+
+        occupied = np.count_nonzero(self.herbs.occupancy + self.carns.occupancy)
+        return occupied, len(self.herbs) + len(self.carns)
+
+    def columns(self):
+        """Ages, weights and island cells of the animals in the strip.
+
+        :returns: tuple with a tuple of columns for each species
+        """
+
+        return tuple((pop.age, pop.weight, pop.cell + self.start)
+                     for pop in (self.herbs, self.carns))
+
+    def feed(self, year, params, neighbours, allowed):
+        """Grazing, hunting, births and migration for one year.
+
+        :param year: number of annual cycles run before this one
+        :param params: tuple with herbivore and carnivore parameters of the island
+        :param neighbours: neighbour table of the island
+        :param allowed: boolean table, True where a move to the neighbour is allowed
+        :returns: tuple with the animals that leave the strip, see :meth:`migration`,
+                  a dictionary with the counts, and the census before feeding
+        """
+
+        census = self.census()
+        self.year = year
+        for pop, new in zip((self.herbs, self.carns), params):
+            if pop.params != new:
+                pop.set_params(new)
+        self.graze()
+        counts = {'kills': self.hunt()}
+        counts['births'] = self.give_birth(self.herbs) + self.give_birth(self.carns)
+        leaving, counts['migrants'] = self.migration(neighbours, allowed)
+        return leaving, counts, census
+
+    def migration(self, neighbours, allowed):
+        """Moves the animals, see :meth:`biosim.Island.RossumIsland.migration`.
+
+        The stores are ordered by cell first, with the same draws for each
+        animal as for the whole island. Animals that stay in the strip are
+        moved in the stores; animals that leave it are removed and returned.
+
+        :param neighbours: neighbour table of the island
+        :param allowed: boolean table, True where a move to the neighbour is allowed
+        :returns: tuple with the ages, weights and new island cells of the
+                  animals of each species that leave the strip, and the
+                  number of animals that moved
+        """
+
+        leaving = []
+        num_moved = 0
+        for pop in (self.herbs, self.carns):
+            pop.sort_by_cell()
+            draws = self.streams.animals(self.year, pop.species.__name__ + ' migration',
+                                         pop.cell)
+            new_cells, moved = migrate(pop.cell + self.start, pop.get_fitness(), pop.params,
+                                       neighbours, allowed, draws)
+            stays = (new_cells >= self.start) & (new_cells < self.stop)
+            leaving.append((pop.age[~stays], pop.weight[~stays], new_cells[~stays]))
+            pop.alive &= stays
+            pop.compact()
+            pop.swap_cells(new_cells[stays] - self.start)
+            num_moved += moved
+        return tuple(leaving), num_moved
+
+    def settle(self, before, after, pyvid):
+        """Places the animals that enter the strip, and runs the end of the year.
+
+        Animals from strips above come before the animals of the strip and
+        animals from strips below after them, which is their order on the
+        whole island, where the stores are ordered by cell before migration.
+
+        :param before: tuple with ages, weights and island cells of each
+                       species entering from strips above
+        :param after: the same for animals entering from strips below
+        :param pyvid: True if this is a year with pyvid (Pythonvirus disease)
+        :returns: tuple with a dictionary with the deaths, and the census
+                  before the end of the year
+        """
+
+        for pop, first, last in zip((self.herbs, self.carns), before, after):
+            if len(first[0]) + len(last[0]) > 0:
+                ages, weights, cells = (np.concatenate(parts) for parts in zip(
+                    first, (pop.age, pop.weight, pop.cell + self.start), last))
+                pop.replace(ages, weights, cells - self.start)
+        census = self.census()
+        return {'deaths': self.end_of_year(pyvid)}, census
+
+
+def _load(worker, tasks):
+    """Creates the resident strips of a worker.
+
+    :param worker: dictionary with the shared arrays and strips of the worker
+    :param tasks: list with the index of each strip, and a tuple with its
+                  start, stop, seed, parameters and animals
+    """
+
+    for index, (start, stop, seed, params, herbs, carns) in tasks:
+        worker['strips'][index] = Strip(start, stop, worker['fodder'], worker['density'],
+                                        seed, params, herbs, carns)
+    return [None] * len(tasks)
+
+
+def _feed(worker, tasks):
+    """Runs :meth:`Strip.feed` for strips of a worker."""
+
+    return [worker['strips'][index].feed(*args, *worker['topology']) for index, args in tasks]
+
+
+def _settle(worker, tasks):
+    """Runs :meth:`Strip.settle` for strips of a worker."""
+
+    return [worker['strips'][index].settle(*args) for index, args in tasks]
+
+
+def _unload(worker, tasks):
+    """Removes strips from a worker, and returns their columns."""
+
+    return [worker['strips'].pop(index).columns() for index, _ in tasks]
+
+
+def _in_worker(payload):
+    """Runs a pickled call in a worker process.
+
+    The call and its result are pickled by the main process itself, so the
+    time spent on it is not hidden in the pool.
+
+    :param payload: bytes with the pickled function and its tasks
+    :returns: bytes with the pickled result
+    """
+
+    function, tasks = pickle.loads(payload)
+    return pickle.dumps(function(_worker, tasks), protocol=pickle.HIGHEST_PROTOCOL)
+
+
+class ParallelIsland:
+    """Runs the annual cycle of an island with the map split into strips of rows.
+
+    Each worker holds the animals of its strips from year to year, with the
+    fodder and the number of animals per cell in arrays it shares with the
+    main process. Once a year, the workers let the animals eat, give birth
+    and migrate, and return only the animals that leave their strip. The
+    main process hands these to the strips they enter, and the workers let
+    the animals age, lose weight and die. With worker processes, each worker
+    is its own process, which keeps its strips and gets the neighbour tables
+    once, when it starts. With threads, nothing is pickled, and the strips
+    run in parallel while the NumPy kernels have released the GIL.
+
+    Each strip orders its animals by cell before migration, as
+    :meth:`biosim.Island.RossumIsland.migration` does for the whole island,
+    and animals entering a strip are placed in the same order as on the
+    whole island. With the random streams keyed by cell, the result is
+    therefore the same for any number of workers and strips.
+
+    While the workers hold the animals, the island's densities and totals
+    are kept up to date through the shared counts. Anything that uses the
+    stores of the island, such as statistics for graphics, checkpoints and
+    new animals, first takes all animals back from the workers; the next
+    annual cycle sends them out again. A headless run therefore only moves
+    the animals once, at the start.
+
+    Wall time is added up in times: 'parallel' for the phases run by the
+    workers, and 'serial' for the rest of the cycle, with the handing over
+    of migrants and the pickling of the calls in the main process.
+
+    Use as a context manager, or call :meth:`close` when done.
+    """
+
+    def __init__(self, island, workers=None, num_strips=None, threads=False,
+                 rows_per_task=None):
+        """
+        :param island: RossumIsland to run
+        :param workers: number of workers; all cores if None
+        :param num_strips: number of strips of rows; one per worker if None
+        :param threads: if True, use a thread pool instead of worker processes
+        :param rows_per_task: number of rows in each strip; overrides num_strips
+        """
+
+        self.island = island
+        rows, cols = island.topology.shape
+        workers = workers or os.cpu_count()
+        if rows_per_task is not None:
+            num_strips = -(-rows // rows_per_task)
+        num_strips = min(rows, num_strips or workers)
+        self.bounds = np.unique(np.linspace(0, rows, num_strips + 1).round().astype(int)) * cols
+        self.times = {'parallel': 0.0, 'serial': 0.0}
+        self._groups = [group for group in np.array_split(np.arange(len(self.bounds) - 1),
+                                                          workers) if len(group) > 0]
+        self._stores = (island.herbs, island.carns)
+        self._resident = False
+
+        self._memory = None
+        if threads:
+            self._executors = [ThreadPoolExecutor(len(self._groups))]
+            self._worker = {'strips': {}, 'fodder': island.fodder, 'density': island.density,
+                            'topology': (island.topology.neighbours, island.topology.allowed)}
+            return
+        self._memory = [shared_memory.SharedMemory(create=True, size=array.nbytes)
+                        for array in (island.fodder, island.density)]
+        island.fodder = self._share(island.fodder, self._memory[0])
+        self._set_density(self._share(island.density, self._memory[1]))
+        self._executors = [ProcessPoolExecutor(1, initializer=_attach,
+                                               initargs=(self._memory[0].name,
+                                                         self._memory[1].name, island.num_cells,
+                                                         island.topology.neighbours,
+                                                         island.topology.allowed))
+                           for _ in self._groups]
+
+    @staticmethod
+    def _share(array, memory):
+        """Copies an array into a shared memory block.
+
+        :returns: array in the shared memory
+        """
+
+        shared = np.ndarray(array.shape, dtype=array.dtype, buffer=memory.buf)
+        shared[...] = array
+        return shared
+
+    def _set_density(self, density):
+        """Makes the island and its stores count the animals in the given matrix."""
+
+        self.island.density = density
+        for pop, counts in zip(self._stores, density):
+            pop.occupancy = counts
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Takes the animals back, stops the workers, and gives the island private arrays again."""
+
+        if self._executors is None:
+            return
+        self.gather()
+        for executor in self._executors:
+            executor.shutdown()
+        self._executors = None
+        if self._memory is not None:
+            self.island.fodder = np.array(self.island.fodder)
+            self._set_density(np.array(self.island.density))
+            for memory in self._memory:
+                memory.close()
+                memory.unlink()
+            self._memory = None
+
+    def annual_cycle(self):
+        """The annual cycle on the island, see :meth:`biosim.Island.RossumIsland.annual_cycle`."""
+
+        start = perf_counter()
+        parallel = self.times['parallel']
+        island = self.island
+        pyvid = False
+        if island.disease:
+            pyvid = island.pyvid()
+
+        island.cycle_counts = dict.fromkeys(PhaseLog.COUNTERS, 0)
+        island.run_phase('update_fodder', (), None, island.update_fodder)
+        if not self._resident:
+            self._scatter()
+        self._run_phase('feeding and migration', self._feed)
+        self._run_phase('end_of_year', self._settle, pyvid)
+        island.year += 1
+        self.times['serial'] += perf_counter() - start - (self.times['parallel'] - parallel)
+
+    def _run_phase(self, name, phase, *args):
+        """Runs a phase in the strips, as :meth:`biosim.Island.RossumIsland.run_phase`.
+
+        :param name: name of the phase in the log
+        :param phase: method that runs the phase and returns the counts, and
+                      the number of cells with animals and animals before it
+        :param args: arguments for the method
+        """
+
+        island = self.island
+        start = perf_counter()
+        counts, (cells, animals) = phase(*args)
+        for counter, count in counts.items():
+            island.cycle_counts[counter] += count
+        if island.phase_log is not None:
+            island.phase_log.add(island.year, name, perf_counter() - start, cells, animals,
+                                 counts)
+
+    def _call(self, function, args):
+        """Calls a function in the workers for every strip.
+
+        :param function: one of _load, _feed, _settle and _unload
+        :param args: list with the arguments for each strip
+        :returns: list with the result for each strip
+        """
+
+        groups = [[(index, args[index]) for index in group] for group in self._groups]
+        if self._memory is not None:
+            groups = [pickle.dumps((function, group), protocol=pickle.HIGHEST_PROTOCOL)
+                      for group in groups]
+        start = perf_counter()
+        if self._memory is None:
+            futures = [self._executors[0].submit(function, self._worker, group)
+                       for group in groups]
+        else:
+            futures = [executor.submit(_in_worker, group)
+                       for executor, group in zip(self._executors, groups)]
+        results = [future.result() for future in futures]
+        self.times['parallel'] += perf_counter() - start
+        if self._memory is not None:
+            results = [pickle.loads(result) for result in results]
+        return [result for group in results for result in group]
+
+    def _scatter(self):
+        """Sends the animals of the island's stores to the strips of the workers."""
+
+        island = self.island
+        params = tuple(dict(pop.params) for pop in self._stores)
+        parts = [self._split(pop) for pop in self._stores]
+        for pop in self._stores:
+            pop.clear()
+        self._call(_load, [(start, stop, island.streams.seed, params, herbs, carns)
+                           for start, stop, herbs, carns
+                           in zip(self.bounds[:-1], self.bounds[1:], *parts)])
+        self._resident = True
+        island.holder = self
+
+    def gather(self):
+        """Takes the animals back from the workers into the island's stores.
+
+        Called by the island before its stores are used. The animals of
+        each cell keep their order.
+        """
+
+        if not self._resident:
+            return
+        self.island.holder = None
+        self._resident = False
+        columns = self._call(_unload, [None] * (len(self.bounds) - 1))
+        for species, pop in enumerate(self._stores):
+            pop.replace(*(np.concatenate(column)
+                          for column in zip(*(strip[species] for strip in columns))))
+
+    def _feed(self):
+        """Runs feeding and migration in the strips, and hands the migrants over.
+
+        :returns: tuple with the kills, births and migrants, and the census
+                  before the phase
+        """
+
+        params = tuple(dict(pop.params) for pop in self._stores)
+        results = self._call(_feed, [(self.island.year, params)] * (len(self.bounds) - 1))
+        self._arriving = self._hand_over([leaving for leaving, _, _ in results])
+        return self._add_up(results, 1)
+
+    def _settle(self, pyvid):
+        """Places the migrants and runs the end of the year in the strips.
+
+        :returns: tuple with the deaths, and the census before the phase
+        """
+
+        results = self._call(_settle, [(before, after, pyvid)
+                                       for before, after in self._arriving])
+        self._arriving = None
+        return self._add_up(results, 0)
+
+    @staticmethod
+    def _add_up(results, counts_at):
+        """Sums the counts and census of the strips.
+
+        :param results: list with a tuple for each strip
+        :param counts_at: position of the counts in the tuples; the census is last
+        :returns: tuple with a dictionary of counts and a tuple with the census
+        """
+
+        counts = {name: sum(result[counts_at][name] for result in results)
+                  for name in results[0][counts_at]}
+        census = tuple(int(value) for value in np.sum([result[-1] for result in results],
+                                                      axis=0))
+        return counts, census
+
+    def _hand_over(self, leaving):
+        """Sorts the animals that leave their strips by the strip they enter.
+
+        :param leaving: list with the animals leaving each strip, see :meth:`Strip.migration`
+        :returns: list with the animals entering each strip from above and
+                  from below, as arguments for :meth:`Strip.settle`
+        """
+
+        num_strips = len(self.bounds) - 1
+        parts = [[self._split_columns(*columns) for columns in strip] for strip in leaving]
+        arriving = []
+        for target in range(num_strips):
+            sides = []
+            for sources in (range(target), range(target + 1, num_strips)):
+                sides.append(tuple(
+                    tuple(np.concatenate([parts[source][species][target][column]
+                                          for source in sources] + [empty])
+                          for column, empty in enumerate(self._empty()))
+                    for species in range(2)))
+            arriving.append(tuple(sides))
+        return arriving
+
+    @staticmethod
+    def _empty():
+        """Empty age, weight and cell columns."""
+
+        return (np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float64),
+                np.empty(0, dtype=np.int32))
+
+    def _split(self, pop):
+        """Splits the animals of a store by strip, keeping their order.
+
+        :param pop: population store
+        :returns: list with ages, weights and island cells for each strip
+        """
+
+        return self._split_columns(pop.age, pop.weight, pop.cell)
+
+    def _split_columns(self, ages, weights, cells):
+        """Splits columns of animals by strip, keeping their order.
+
+        :returns: list with ages, weights and island cells for each strip
+        """
+
+        strip = np.searchsorted(self.bounds, cells, side='right') - 1
+        order = np.argsort(strip, kind='stable')
+        ends = np.searchsorted(strip[order], np.arange(len(self.bounds)))
+        return [(ages[rows], weights[rows], cells[rows])
+                for rows in (order[first:last] for first, last in zip(ends[:-1], ends[1:]))]
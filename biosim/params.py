@@ -0,0 +1,22 @@
+from biosim.animals import Herbivore, Carnivore
+from biosim.landscape import Highland, Lowland
+
+__author__ = "Sara Idris & Thorbjørn L Onsaker, NMBU"
+__email__ = "said@nmbu.no & thon@nmbu.no"
+
+SPECIES = ('Herbivore', 'Carnivore')
+
+# Classes with the default parameters a simulation starts from
+PARAM_CLASSES = {'Herbivore': Herbivore, 'Carnivore': Carnivore,
+                 'H': Highland, 'L': Lowland}
+
+
+def default_params():
+    """Copies the class-level animal and landscape parameters.
+
+    :returns: dictionary with a parameter dictionary per species name and
+              landscape code letter
+    """
+
+    return {name: dict(cls.params if name in SPECIES else cls.d_landscape)
+            for name, cls in PARAM_CLASSES.items()}
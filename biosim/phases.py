@@ -0,0 +1,111 @@
+from biosim.kernels import birth, end_of_year, graze, predation
+import numpy as np
+
+__author__ = "Sara Idris & Thorbjørn L Onsaker, NMBU"
+__email__ = "said@nmbu.no & thon@nmbu.no"
+
+
+class CellPhases:
+    """Phases of the annual cycle where animals only meet animals in the same cell.
+
+    Used by :class:`biosim.Island.RossumIsland` for the whole island, and by
+    :mod:`biosim.parallel` for one strip of it. The class using it must have
+
+        herbs, carns: :class:`biosim.population.Population`
+            Stores with the animals of each species.
+        fodder: numpy array
+            Available fodder in each cell.
+        streams: :class:`biosim.streams.Streams`
+            Random streams, keyed by the cell indices of the stores.
+        year: int
+            Number of annual cycles run before this one.
+    """
+
+    def graze(self):
+        """Lets all herbivores on the island eat fodder, see :func:`biosim.kernels.graze`."""
+
+        eaten = graze(self.herbs.cell, self.fodder, self.herbs.params,
+                      self.streams.animals(self.year, 'graze', self.herbs.cell))
+        fed = np.flatnonzero(eaten > 0)
+        self.herbs.weight[fed] += self.herbs.params['beta'] * eaten[fed]
+        self.herbs.invalidate(fed)
+
+    def hunt(self):
+        """Carnivores hunt herbivores in all cells where both species live.
+
+        Only cells in the active index of both species are visited. Eaten
+        herbivores are removed from the store.
+
+        :returns: number of herbivores killed
+        """
+
+        num_herbs = len(self.herbs)
+        cells = np.intersect1d(self.herbs.active, self.carns.active, assume_unique=True)
+        if len(cells) > 0:
+            self.herbs.sort_by_cell()
+            self.carns.sort_by_cell()
+            keys = self.streams.keys(self.year, 'hunt', cells)
+            for cell, key, herb_start, herb_stop, carn_start, carn_stop in zip(
+                    cells, keys, *self.herbs.rows_in(cells), *self.carns.rows_in(cells)):
+                self.eat_all(np.arange(herb_start, herb_stop),
+                             np.arange(carn_start, carn_stop),
+                             self.streams.stream(self.year, 'hunt', cell, key))
+        self.herbs.compact()
+        return num_herbs - len(self.herbs)
+
+    def eat_all(self, herbs, carns, stream):
+        """Carnivores in a cell hunt herbivores.
+
+        Carnivores eats in order based on fitness, and hunt herbivores
+        from the lowest fitness and up. Eaten herbivores are marked as not alive.
+
+        :param herbs: herbivore rows in the cell
+        :param carns: carnivore rows in the cell
+        :param stream: random stream of the cell
+        """
+
+        carn_weight, killed = predation(self.carns.age[carns], self.carns.weight[carns],
+                                        self.herbs.get_fitness(herbs), self.herbs.weight[herbs],
+                                        self.carns.params, stream)
+        self.herbs.alive[herbs[killed]] = False
+        self.carns.weight[carns] = carn_weight
+        self.carns.invalidate(carns)
+
+    def give_birth(self, pop):
+        """Lets all animals of a species give birth, see :func:`biosim.kernels.birth`.
+
+        The offsprings are appended to the store in one step.
+
+        :param pop: population store of the species
+        :returns: number of offsprings
+        """
+
+        num_in_cell = pop.occupancy[pop.cell]
+        draws = self.streams.animals(self.year, pop.species.__name__ + ' birth', pop.cell)
+        mothers, offspring = birth(pop.weight, pop.get_fitness(), num_in_cell,
+                                   pop.params, draws)
+        pop.weight[mothers] -= pop.params['xi'] * offspring
+        pop.invalidate(mothers)
+        pop.add(np.zeros(len(mothers)), offspring, pop.cell[mothers])
+        return len(mothers)
+
+    def end_of_year(self, pyvid=False):
+        """Ages all animals, reduces their weight and removes the animals that die.
+
+        Done in one pass over each store, see :func:`biosim.kernels.end_of_year`.
+        The number of animals in each cell is counted once for both species.
+
+        :param pyvid: True if this is a year with pyvid (Pythonvirus disease).
+        :returns: number of animals that died
+        """
+
+        num_animals = len(self.herbs) + len(self.carns)
+        num_in_cell = [self.herbs.occupancy[pop.cell] + self.carns.occupancy[pop.cell]
+                       for pop in (self.herbs, self.carns)]
+        for pop, num in zip((self.herbs, self.carns), num_in_cell):
+            draws = self.streams.animals(self.year, pop.species.__name__ + ' death', pop.cell)
+            phi, dies = end_of_year(pop.age, pop.weight, num, pop.params, draws, pyvid)
+            pop.set_fitness(phi)
+            pop.alive &= ~dies
+            pop.compact()
+        return num_animals - len(self.herbs) - len(self.carns)
@@ -0,0 +1,263 @@
+from biosim.kernels import fitness
+import numpy as np
+
+__author__ = "Sara Idris & Thorbjørn L Onsaker, NMBU"
+__email__ = "said@nmbu.no & thon@nmbu.no"
+
+
+class Population:
+    """Columnar store for all animals of one species on the island.
+
+    Each animal is one row in a set of parallel arrays instead of a separate object.
+
+        age: numpy array (int32)
+            Age of each animal.
+        weight: numpy array (float64)
+            Weight of each animal.
+        cell: numpy array (int32)
+            Flat index of the cell the animal lives in (row * number of columns + column).
+        alive: numpy array (bool)
+            False for animals that have died or been eaten, until :meth:`compact` is called.
+        occupancy: numpy array (int64)
+            Number of rows in each cell of the island, updated when animals are
+            added, removed or move. May be a view into a count matrix shared
+            with other stores.
+
+    Fitness is cached per row and only recomputed for rows marked as stale.
+    All rows become stale when the parameters are changed with :meth:`set_params`,
+    or, for a store that uses the class parameters of the species, with
+    :meth:`biosim.animals.Animal.set_params`.
+    """
+
+    def __init__(self, species, num_cells, occupancy=None, params=None):
+        """
+        :param species: animal class (Herbivore or Carnivore) the store holds
+        :param num_cells: number of cells on the island
+        :param occupancy: int64 array with num_cells zeros to keep the counts in;
+                          allocated if None
+        :param params: parameter dictionary owned by the store; the class
+                       parameters of the species are used if None
+        """
+
+        self.species = species
+        self._shared_params = params is None
+        self.params = species.params if params is None else params
+        self.age = np.empty(0, dtype=np.int32)
+        self.weight = np.empty(0, dtype=np.float64)
+        self.cell = np.empty(0, dtype=np.int32)
+        self.alive = np.empty(0, dtype=bool)
+        self._fitness = np.empty(0, dtype=np.float64)
+        self._stale = np.empty(0, dtype=bool)
+        self._params_version = species.params_version
+        self._cell_buffer = None
+        if occupancy is None:
+            occupancy = np.zeros(num_cells, dtype=np.int64)
+        self.occupancy = occupancy
+        self._active = np.empty(0, dtype=np.int64)
+        self._gained = []
+
+    def __len__(self):
+        return len(self.age)
+
+    def add(self, ages, weights, cells):
+        """Appends new animals to the store.
+
+        :param ages: ages of the new animals
+        :param weights: weights of the new animals
+        :param cells: flat cell index of each new animal, or a single index for all of them
+        """
+
+        weights = np.asarray(weights, dtype=np.float64)
+        num = len(weights)
+        self.age = np.concatenate((self.age, np.asarray(ages, dtype=np.int32)))
+        self.weight = np.concatenate((self.weight, weights))
+        self.cell = np.concatenate((self.cell, np.broadcast_to(
+            np.asarray(cells, dtype=np.int32), (num,))))
+        self.alive = np.concatenate((self.alive, np.ones(num, dtype=bool)))
+        self._fitness = np.concatenate((self._fitness, np.zeros(num)))
+        self._stale = np.concatenate((self._stale, np.ones(num, dtype=bool)))
+        self._count(self.cell[len(self) - num:], 1)
+
+    @property
+    def active(self):
+        """Sorted array with the cells that have at least one animal of the species.
+
+        Kept up to date from the cells that gained animals since the last
+        call, so only populated cells and changed cells are looked at.
+        """
+
+        if len(self._gained) > 0:
+            self._active = np.union1d(self._active, np.concatenate(self._gained))
+            self._gained = []
+        self._active = self._active[self.occupancy[self._active] > 0]
+        return self._active
+
+    def _count(self, cells, change):
+        """Updates the occupancy of the given cells.
+
+        :param cells: cell of each animal that was added or removed
+        :param change: 1 for added animals, -1 for removed animals
+        """
+
+        cells, num = np.unique(cells, return_counts=True)
+        self.occupancy[cells] += change * num
+        if change > 0:
+            self._gained.append(cells)
+
+    def get_fitness(self, index=None):
+        """Returns fitness for the given rows, recomputing stale values only.
+
+        :param index: integer array with rows; all rows if None
+        :returns: array with fitness values
+        """
+
+        if self._shared_params and self._params_version != self.species.params_version:
+            self._params_version = self.species.params_version
+            self.invalidate()
+        if index is None:
+            index = np.arange(len(self))
+        stale = index[self._stale[index]]
+        if len(stale) > 0:
+            self._fitness[stale] = fitness(self.age[stale], self.weight[stale], self.params)
+            self._stale[stale] = False
+        return self._fitness[index]
+
+    def set_fitness(self, values):
+        """Stores freshly computed fitness for all rows.
+
+        :param values: array with one fitness value per row
+        """
+
+        self._fitness = np.asarray(values, dtype=np.float64)
+        self._stale[:] = False
+        self._params_version = self.species.params_version
+
+    def set_params(self, new_params):
+        """Overrides parameters of the store and flushes the cached fitness.
+
+        :param new_params: new input parameters
+        """
+
+        self.params.update(new_params)
+        if self._shared_params:
+            self.species.invalidate_fitness()
+        self.invalidate()
+
+    def invalidate(self, index=None):
+        """Marks cached fitness as stale after age or weight has changed.
+
+        :param index: rows to invalidate; all rows if None
+        """
+
+        if index is None:
+            self._stale[:] = True
+        else:
+            self._stale[index] = True
+
+    def take(self, index):
+        """Keeps only the given rows, in the given order.
+
+        :param index: integer array with the rows to keep
+        """
+
+        self.age = self.age[index]
+        self.weight = self.weight[index]
+        self.cell = self.cell[index]
+        self.alive = self.alive[index]
+        self._fitness = self._fitness[index]
+        self._stale = self._stale[index]
+
+    def clear(self):
+        """Removes all animals from the store."""
+
+        self.take(np.empty(0, dtype=np.int64))
+        self.occupancy[:] = 0
+        self._active = np.empty(0, dtype=np.int64)
+        self._gained = []
+
+    def replace(self, ages, weights, cells):
+        """Replaces all animals of the store.
+
+        The animals in each cell are counted in one pass, without sorting.
+
+        :param ages: age of each animal
+        :param weights: weight of each animal
+        :param cells: flat cell index of each animal
+        """
+
+        self.age = np.asarray(ages, dtype=np.int32)
+        self.weight = np.asarray(weights, dtype=np.float64)
+        self.cell = np.asarray(cells, dtype=np.int32)
+        self.alive = np.ones(len(self.age), dtype=bool)
+        self._fitness = np.zeros(len(self.age))
+        self._stale = np.ones(len(self.age), dtype=bool)
+        self.occupancy[:] = np.bincount(self.cell, minlength=len(self.occupancy))
+        self._active = np.flatnonzero(self.occupancy)
+        self._gained = []
+
+    def cell_buffer(self):
+        """Spare array for writing the next cell of every animal.
+
+        Used with :meth:`swap_cells` to double buffer the cell column,
+        so the current cells stay unchanged while the next ones are written.
+
+        :returns: array with the same length and type as the cell column
+        """
+
+        if self._cell_buffer is None or len(self._cell_buffer) != len(self):
+            self._cell_buffer = np.empty_like(self.cell)
+        return self._cell_buffer
+
+    def swap_cells(self, new_cells):
+        """Makes new_cells the cell column, and keeps the old one as buffer.
+
+        :param new_cells: array with the next cell of every animal
+        """
+
+        moved = np.flatnonzero(self.cell != new_cells)
+        self._count(self.cell[moved], -1)
+        self._count(new_cells[moved], 1)
+        self._cell_buffer, self.cell = self.cell, new_cells
+
+    def compact(self):
+        """Removes animals that are no longer alive."""
+
+        if not self.alive.all():
+            self._count(self.cell[~self.alive], -1)
+            self.take(np.flatnonzero(self.alive))
+
+    def sort_by_cell(self):
+        """Orders the rows by cell, keeping the order within each cell."""
+
+        self.take(np.argsort(self.cell, kind='stable'))
+
+    def rows_in(self, cells):
+        """Finds the rows of the given cells, after :meth:`sort_by_cell`.
+
+        :param cells: sorted array with cells
+        :returns: tuple with the first row of each cell and the row after its last
+        """
+
+        return (np.searchsorted(self.cell, cells, side='left'),
+                np.searchsorted(self.cell, cells, side='right'))
+
+    def counts(self):
+        """Counts the living animals in each cell from scratch.
+
+        :returns: array with one count per cell
+        """
+
+        return np.bincount(self.cell[self.alive], minlength=len(self.occupancy))
+
+    def animals(self, cell=None):
+        """Creates animal objects for the living animals, for use with the object API.
+
+        The objects are copies; changing them does not change the store.
+
+        :param cell: flat cell index; all cells if None
+        :returns: list of animal objects
+        """
+
+        rows = self.alive if cell is None else self.alive & (self.cell == cell)
+        return [self.species(int(age), float(weight))
+                for age, weight in zip(self.age[rows], self.weight[rows])]
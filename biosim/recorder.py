@@ -0,0 +1,261 @@
+import numpy as np
+import os
+
+__author__ = "Sara Idris & Thorbjørn L Onsaker, NMBU"
+__email__ = "said@nmbu.no & thon@nmbu.no"
+
+
+class ColumnFile:
+    """A .npy file that rows can be appended to.
+
+    The header has a fixed size, so the number of rows in it can be
+    rewritten in place after each append. The header is written after the
+    data, so the file always loads with np.load, also while it is written
+    to, and shows the rows appended so far.
+    """
+
+    # Size of the header in bytes, magic string included
+    HEADER_SIZE = 128
+
+    def __init__(self, filename, dtype, shape=()):
+        """
+        :param filename: name of the file; an existing file is overwritten
+        :param dtype: numpy data type of the values
+        :param shape: shape of each row
+        """
+
+        self.dtype = np.dtype(dtype)
+        self.shape = tuple(shape)
+        self.num_rows = 0
+        self._file = open(filename, 'w+b')
+        self._write_header()
+
+    def _write_header(self):
+        header = repr({'descr': np.lib.format.dtype_to_descr(self.dtype),
+                       'fortran_order': False, 'shape': (self.num_rows,) + self.shape})
+        header = header.ljust(self.HEADER_SIZE - 11) + '\n'
+        self._file.seek(0)
+        self._file.write(b'\x93NUMPY\x01\x00' + np.uint16(len(header)).tobytes()
+                         + header.encode('latin1'))
+
+    def append(self, rows):
+        """Appends rows at the end of the file.
+
+        :param rows: array with the shape of a row after the number of rows
+        """
+
+        rows = np.ascontiguousarray(rows, dtype=self.dtype)
+        self._file.seek(0, os.SEEK_END)
+        self._file.write(rows.tobytes())
+        self.num_rows += len(rows)
+        self._write_header()
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class Recorder:
+    """Writes one row per year of a simulation to .npy files in a directory.
+
+    Pass to :meth:`biosim.simulation.BioSim.simulate` or
+    :meth:`biosim.simulation.BioSim.iter_years`. Each column is its own file,
+
+        year: int64
+            The year of the row.
+        herbivores, carnivores: int64
+            Number of animals of each species at the start of the year.
+        births, deaths, kills, migrants: int64
+            Counters of the annual cycle before the year, see
+            :attr:`biosim.Island.RossumIsland.cycle_counts`.
+        herbivore_density, carnivore_density: uint32, rows x columns
+            Number of animals of each species in each cell, if density is True.
+
+    Rows are kept in memory until flush_years rows are collected, and then
+    appended to the files, so memory use does not grow with the number of
+    years. Read the files with :func:`read`, also while the run is going on.
+    Use as a context manager, or call :meth:`close` when done.
+    """
+
+    COLUMNS = ('year', 'herbivores', 'carnivores', 'births', 'deaths', 'kills', 'migrants')
+    DENSITIES = ('herbivore_density', 'carnivore_density')
+
+    def __init__(self, directory, density=False, flush_years=10):
+        """
+        :param directory: directory for the files; created if it does not exist
+        :param density: if True, also record the density of each species in each cell
+        :param flush_years: number of rows to collect before they are written
+        """
+
+        self.directory = directory
+        self.density = density
+        self.flush_years = flush_years
+        os.makedirs(directory, exist_ok=True)
+        self._files = None
+        self._rows = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @classmethod
+    def row(cls, year, island):
+        """Values of the columns in COLUMNS for the current state of the island.
+
+        :param year: year of the row
+        :param island: RossumIsland
+        :returns: tuple with one value per column
+        """
+
+        counts = island.cycle_counts
+        return (year,) + island.get_totals() + tuple(counts[name] for name in cls.COLUMNS[3:])
+
+    def record(self, year, island):
+        """Adds a row with the current state of the island.
+
+        :param year: year of the row
+        :param island: RossumIsland
+        """
+
+        row = list(self.row(year, island))
+        if self.density:
+            row.extend(density.astype(np.uint32) for density in island.get_pop_info()[:2])
+        self._rows.append(row)
+        if len(self._rows) >= self.flush_years:
+            self.flush()
+
+    def flush(self):
+        """Writes the collected rows to the files."""
+
+        if len(self._rows) == 0:
+            return
+        if self._files is None:
+            self._open(self._rows[0])
+        for file, column in zip(self._files, zip(*self._rows)):
+            file.append(np.array(column))
+        self._rows = []
+
+    def _open(self, row):
+        names = self.COLUMNS + (self.DENSITIES if self.density else ())
+        self._files = [ColumnFile(os.path.join(self.directory, name + '.npy'),
+                                  np.uint32 if name in self.DENSITIES else np.int64,
+                                  np.shape(value))
+                       for name, value in zip(names, row)]
+
+    def close(self):
+        """Writes the collected rows and closes the files."""
+
+        self.flush()
+        for file in self._files or ():
+            file.close()
+        self._files = None
+
+
+def read(directory):
+    """Reads the columns written by a :class:`Recorder`, without loading them into memory.
+
+    :param directory: directory of the recorder
+    :returns: dictionary with a read-only memory-mapped array for each column
+    """
+
+    return {name[:-4]: np.load(os.path.join(directory, name), mmap_mode='r')
+            for name in sorted(os.listdir(directory)) if name.endswith('.npy')}
+
+
+class DensityCube:
+    """Number of animals of each species in each cell and year, in a memory-mapped .npy file.
+
+    The cube has the shape (years, rows, columns, species), with herbivores
+    first on the last axis, and is allocated in full when it is created.
+    Each recorded year is written straight into the file, so nothing is
+    collected in memory. Slices of the cube, such as the densities from
+    :meth:`pop_info`, are views into the file.
+
+    Can be passed as recorder to :meth:`biosim.simulation.BioSim.simulate`
+    and :meth:`biosim.simulation.BioSim.iter_years`, alone or in a list with
+    a :class:`Recorder`.
+    """
+
+    def __init__(self, cube, first_year=1):
+        """Use :meth:`create` or :meth:`open` instead.
+
+        :param cube: memory-mapped array with shape (years, rows, columns, 2)
+        :param first_year: year of the first entry in the cube
+        """
+
+        self.cube = cube
+        self.first_year = first_year
+
+    @classmethod
+    def create(cls, filename, num_years, shape, dtype=np.uint16, first_year=1):
+        """Creates a cube filled with zeros.
+
+        :param filename: name of the .npy file; an existing file is overwritten
+        :param num_years: number of years in the cube
+        :param shape: tuple with the number of rows and columns of the island
+        :param dtype: unsigned integer type for the counts
+        :param first_year: year of the first entry in the cube
+        :returns: DensityCube
+        """
+
+        return cls(np.lib.format.open_memmap(filename, mode='w+', dtype=dtype,
+                                             shape=(num_years,) + tuple(shape) + (2,)),
+                   first_year)
+
+    @classmethod
+    def open(cls, filename, first_year=1, mode='r'):
+        """Opens a cube written earlier.
+
+        :param filename: name of the .npy file
+        :param first_year: year of the first entry in the cube
+        :param mode: 'r' for read-only, 'r+' to record more years
+        :returns: DensityCube
+        """
+
+        return cls(np.load(filename, mmap_mode=mode), first_year)
+
+    @property
+    def years(self):
+        """Array with the year of each entry in the cube."""
+
+        return np.arange(self.first_year, self.first_year + len(self.cube))
+
+    def record(self, year, island):
+        """Writes the density of both species in the current year.
+
+        :param year: year of the entry
+        :param island: RossumIsland with the shape of the cube
+        :raises ValueError: if the year is outside the cube, or a count
+                            does not fit the type of the cube
+        """
+
+        index = year - self.first_year
+        if not 0 <= index < len(self.cube):
+            raise ValueError('Year {} is outside the cube'.format(year))
+        if island.density.max(initial=0) > np.iinfo(self.cube.dtype).max:
+            raise ValueError('Density does not fit in ' + str(self.cube.dtype))
+        for species, density in enumerate(island.density):
+            self.cube[index, ..., species] = density.reshape(self.cube.shape[1:3])
+
+    def pop_info(self, year):
+        """Densities and totals of one year, as :meth:`biosim.Island.RossumIsland.get_pop_info`.
+
+        :param year: year of the entry
+        :returns: tuple with views of the herbivore and carnivore density,
+                  and the total number of herbivores and carnivores
+        """
+
+        densities = self.cube[year - self.first_year]
+        herbs, carns = densities[..., 0], densities[..., 1]
+        return herbs, carns, int(herbs.sum()), int(carns.sum())
+
+    def flush(self):
+        """Writes changes in the cube to the file."""
+
+        if self.cube.flags.writeable:
+            self.cube.flush()
+
+    def close(self):
+        self.flush()
@@ -1,16 +1,31 @@
-import random
-from .graphics import Graphics
+from collections import namedtuple
+import json
+import numpy as np
 from biosim.Island import RossumIsland
-from biosim.animals import Herbivore, Carnivore
-from biosim.landscape import Lowland, Highland
+from biosim.animals import Carnivore
 
 __author__ = "Sara Idris & Thorbjørn L Onsaker, NMBU"
 __email__ = "said@nmbu.no & thon@nmbu.no"
 
+YearRecord = namedtuple('YearRecord', ['year', 'num_herbivores', 'num_carnivores',
+                                       'herbivore_density', 'carnivore_density',
+                                       'herbivore_stats', 'carnivore_stats'])
+YearRecord.__doc__ = """State of the island in one year, yielded by :meth:`BioSim.iter_years`.
+
+Densities are read-only 2 dimensional arrays with the number of animals in
+each cell, and stats are :class:`SpeciesStats`. Both are None unless asked for.
+"""
+
+SpeciesStats = namedtuple('SpeciesStats', ['mean_age', 'mean_weight', 'mean_fitness'])
+SpeciesStats.__doc__ = """Mean age, weight and fitness of one species, nan if it has no animals."""
+
 
 class BioSim:
     """ A simulation class for the ecosystem on the island."""
 
+    # Version of the checkpoint format written by save_checkpoint
+    CHECKPOINT_VERSION = 2
+
     DEFAULT_CMAX_ANIMALS = {'Herbivore': 200, 'Carnivore': 50}
     DEFAULT_HIST_SPECS = {'weight': {'max': 60, 'delta': 2},
                           'age': {'max': 60, 'delta': 2},
@@ -18,7 +33,8 @@ class BioSim:
 
     def __init__(self, island_map, ini_pop, seed,
                  ymax_animals=None, cmax_animals=None, hist_specs=None,
-                 img_base=None, img_fmt='png', disease=False):
+                 img_base=None, img_fmt='png', disease=False, workers=1, threads=False,
+                 log_phases=False, rows_per_task=None):
         """
         :param island_map: Multi-line string specifying island geography
         :param ini_pop: List of dictionaries specifying initial population
@@ -27,16 +43,24 @@ class BioSim:
         :param cmax_animals: Dict specifying color-code limits for animal densities
         :param hist_specs: Specifications for histograms, see below
         :param img_base: String with beginning of file name for figures, including path
-        :param img_fmt: String with file type for figures, e.g. ’png’"""
+        :param img_fmt: String with file type for figures, e.g. ’png’
+        :param disease: True to run with pyvid (Pythonvirus disease)
+        :param workers: number of workers for the annual cycle, see
+                :class:`biosim.parallel.ParallelIsland`; None for all cores.
+                Call :meth:`close` when done if not 1.
+        :param threads: True to use threads instead of processes as workers
+        :param log_phases: True to record wall time and counters for each phase
+                of each year, see :attr:`phase_log`
+        :param rows_per_task: number of rows of the map in each strip the
+                workers hold; None for one strip per worker"""
 
-        random.seed(seed)
         self.ymax_animals = ymax_animals
         self.cmax_animals = cmax_animals
         self.hist_specs = hist_specs
         self.img_name = img_base
         self.img_fmt = img_fmt
         self.ini_pop = ini_pop
-        self.island = RossumIsland(island_map, disease)
+        self.island = RossumIsland(island_map, disease, seed=seed)
         self.island.insert_population(self.ini_pop)
         self.island_map = island_map
         self.animal = 0
@@ -53,11 +77,20 @@ class BioSim:
             new = self.merge_params(self.DEFAULT_HIST_SPECS, self.hist_specs)
             self.hist_specs = new
 
-        self._graphics = Graphics(self.hist_specs, self.cmax_animals,
-                                  self.ymax_animals, self.img_name, self.img_fmt)
+        self._graphics = None
+        if log_phases:
+            from .instrumentation import PhaseLog
+            self.island.phase_log = PhaseLog()
+        self._parallel = None
+        if workers != 1:
+            from .parallel import ParallelIsland
+            self._parallel = ParallelIsland(self.island, workers, threads=threads,
+                                            rows_per_task=rows_per_task)
 
     def set_animal_parameters(self, species, params):
-        """Set parameters for animal species.
+        """Set parameters for animal species in this simulation.
+
+        The class defaults and other simulations are not changed.
 
         :param species: String, name of animal species
         :param params: Dict with valid parameter specification for species
@@ -77,12 +110,7 @@ class BioSim:
                 raise ValueError('DeltaPhiMax must be strictly positive')
             if 'eta' in params and params['eta'] > 1:
                 raise ValueError('eta must be a value between 0 and 1')
-        if species == 'Carnivore':
-            Carnivore().set_params(self.merge_params(Carnivore().params, params))
-        elif species == 'Herbivore':
-            Herbivore().set_params(self.merge_params(Herbivore().params, params))
-        else:
-            raise ValueError('Species must be either Carnivore or Herbivore')
+        self.island.set_animal_params(species, params)
 
     @staticmethod
     def merge_params(params1, params2):
@@ -97,29 +125,34 @@ class BioSim:
         return {**params1, **params2}
 
     def set_landscape_parameters(self, landscape, params):
-        """Set parameters for landscape type.
+        """Set parameters for landscape type in this simulation.
 
         :param landscape: String, code letter for landscape
         :param params: Dict with valid parameter specification for landscape
 
         :raises ValueError: if character not a legal landscape type
         """
-        if landscape == 'L':
-            Lowland().set_params(self.merge_params(Lowland().d_landscape, params))
-        elif landscape == 'H':
-            Highland().set_params(self.merge_params(Highland().d_landscape, params))
-        else:
-            raise ValueError(landscape + ' is not a legal landscape type')
 
-    def simulate(self, num_years, vis_years=1, img_years=None):
+        self.island.set_landscape_params(landscape, params)
+
+    def simulate(self, num_years, vis_years=1, img_years=None, recorder=None):
         """Run simulation while visualizing the result.
 
         :param num_years: number of years to simulate
-        :param vis_years: years between visualization updates
+        :param vis_years: years between visualization updates; None to run
+                headless, without creating any figure or gathering statistics
         :param img_years: years between visualizations saved to files (default: vis_years)
                 Image files will be numbered consecutively.
+        :param recorder: :class:`biosim.recorder.Recorder` or
+                :class:`biosim.recorder.DensityCube` to record each year in, or a list of them
         """
 
+        if vis_years is None:
+            if img_years is not None:
+                raise ValueError('img_years requires vis_years')
+            self._simulate_headless(num_years, recorder)
+            return
+
         if img_years is None:
             img_years = vis_years
 
@@ -127,22 +160,212 @@ class BioSim:
             raise ValueError('img_steps must be multiple of vis_steps')
 
         self._final_year = self._year + num_years
-        self._graphics.setup(self._final_year, img_years, self.island_map)
+        graphics = self._get_graphics()
+        graphics.setup(self._final_year, img_years, self.island_map)
 
         # plot initial status if at very beginning of simulation
         if self._year == 0:
-            self._graphics.update(self._year,
-                                  self.island.get_stats(),
-                                  self.island.get_pop_info())
-            self.island.annual_cycle()
+            graphics.update(self._year,
+                            self.island.get_stats(),
+                            self.island.get_pop_info())
+            self._annual_cycle()
         while self._year < self._final_year:
             self._year += 1
+            self._record(recorder)
 
             if self._year % vis_years == 0:
-                self._graphics.update(self._year,
-                                      self.island.get_stats(),
-                                      self.island.get_pop_info())
+                graphics.update(self._year,
+                                self.island.get_stats(),
+                                self.island.get_pop_info())
+            self._annual_cycle()
+
+    def _simulate_headless(self, num_years, recorder=None):
+        """Run simulation without visualization.
+
+        Follows the same sequence of annual cycles as :meth:`simulate`
+        with visualization, so results do not depend on vis_years.
+
+        :param num_years: number of years to simulate
+        :param recorder: recorder or list of recorders for each year
+        """
+
+        for _ in self.iter_years(num_years, recorder=recorder):
+            pass
+
+    def iter_years(self, num_years, density=False, stats=False, recorder=None):
+        """Run simulation one year at a time, yielding a record for each year.
+
+        Follows the same sequence of annual cycles as :meth:`simulate`, and each
+        record holds the state that :meth:`simulate` would visualize for the
+        year. The record is made before the annual cycle of the year is run,
+        so breaking out of the loop leaves the simulation at the year of the
+        last record, as if :meth:`simulate` had been called up to that year.
+
+        :param num_years: number of years to simulate
+        :param density: if True, include the density of each species
+        :param stats: if True, include mean age, weight and fitness of each species
+        :param recorder: :class:`biosim.recorder.Recorder` or
+                :class:`biosim.recorder.DensityCube` to record each year in, or a list of them
+        :returns: generator yielding one :class:`YearRecord` per year
+        """
+
+        self._final_year = self._year + num_years
+        if self._year == 0:
+            self._annual_cycle()
+        while self._year < self._final_year:
+            self._year += 1
+            self._record(recorder)
+            record = self._year_record(density, stats)
+            self._annual_cycle()
+            yield record
+
+    def _record(self, recorder):
+        """Records the current year in a recorder, or in each recorder of a list.
+
+        :param recorder: recorder, list of recorders or None
+        """
+
+        if recorder is None:
+            return
+        for each in recorder if isinstance(recorder, (list, tuple)) else (recorder,):
+            each.record(self._year, self.island)
+
+    def _year_record(self, density, stats):
+        """Collects the requested state of the island for the current year.
+
+        :returns: YearRecord for the current year
+        """
+
+        herb_density = carn_density = herb_stats = carn_stats = None
+        if density:
+            herb_density, carn_density = (np.array(array) for array
+                                          in self.island.get_pop_info()[:2])
+            herb_density.flags.writeable = False
+            carn_density.flags.writeable = False
+        if stats:
+            herb_age, carn_age, herb_weight, carn_weight, herb_phi, carn_phi = \
+                self.island.get_stats()
+            herb_stats = self._species_stats(herb_age, herb_weight, herb_phi)
+            carn_stats = self._species_stats(carn_age, carn_weight, carn_phi)
+        num_herbs, num_carns = self.island.get_totals()
+        return YearRecord(self._year, num_herbs, num_carns, herb_density, carn_density,
+                          herb_stats, carn_stats)
+
+    @staticmethod
+    def _species_stats(age, weight, fitness):
+        """Mean age, weight and fitness of one species.
+
+        :returns: SpeciesStats with nan for a species with no animals
+        """
+
+        if len(age) == 0:
+            return SpeciesStats(np.nan, np.nan, np.nan)
+        return SpeciesStats(float(age.mean()), float(weight.mean()), float(fitness.mean()))
+
+    def _annual_cycle(self):
+        """Runs one annual cycle, in the worker processes if there are any."""
+
+        if self._parallel is None:
             self.island.annual_cycle()
+        else:
+            self._parallel.annual_cycle()
+
+    @property
+    def phase_log(self):
+        """Wall time and counters per phase and year as a numpy structured array,
+        see :class:`biosim.instrumentation.PhaseLog`, or None if not recorded."""
+
+        if self.island.phase_log is None:
+            return None
+        return self.island.phase_log.records
+
+    def save_phase_log(self, filename):
+        """Saves the phase log to a CSV file, or to a NPZ file if filename ends with '.npz'.
+
+        :raises ValueError: if the phase log is not recorded
+        """
+
+        if self.island.phase_log is None:
+            raise ValueError('Phase log requires log_phases=True')
+        self.island.phase_log.save(filename)
+
+    def save_checkpoint(self, filename):
+        """Saves the state of the simulation, to continue it with :meth:`load_checkpoint`.
+
+        The file is an uncompressed NPZ file with the fodder and the age,
+        weight and cell of all animals as separate arrays, and the map, year,
+        seed and parameters as JSON. The random streams are keyed by seed and
+        year, so these are the whole random state. Graphics and the phase log
+        are not saved.
+
+        :param filename: name of the file, used as given
+        """
+
+        columns, settings = self.island.get_state()
+        settings.update({'version': self.CHECKPOINT_VERSION, 'island_map': self.island_map,
+                         'sim_year': self._year})
+        with open(filename, 'wb') as file:
+            np.savez(file, settings=np.frombuffer(json.dumps(settings).encode(), dtype=np.uint8),
+                     **columns)
+
+    @classmethod
+    def load_checkpoint(cls, filename, **kwargs):
+        """Creates a simulation from a file written by :meth:`save_checkpoint`.
+
+        Simulating on gives the same result as if the saved simulation had
+        never stopped.
+
+        :param filename: name of the file
+        :param kwargs: other arguments for :class:`BioSim`, such as img_base or workers.
+                The checkpoint decides island_map, seed and disease; these may
+                only be given with the values in the checkpoint.
+        :returns: BioSim at the year of the checkpoint
+        :raises ValueError: if the file is from another version of the format,
+                or kwargs give island_map, seed or disease another value
+                than the checkpoint, or give ini_pop
+        """
+
+        with np.load(filename, allow_pickle=False) as data:
+            settings = json.loads(data['settings'].tobytes().decode())
+            if settings.get('version') != cls.CHECKPOINT_VERSION:
+                raise ValueError('Unsupported checkpoint version: '
+                                 + str(settings.get('version')))
+            if 'ini_pop' in kwargs:
+                raise ValueError('The animals are taken from the checkpoint, not ini_pop')
+            for name in ('island_map', 'seed', 'disease'):
+                if name in kwargs and kwargs.pop(name) != settings[name]:
+                    raise ValueError(name + ' differs from the checkpoint')
+            sim = cls(settings['island_map'], [], settings['seed'],
+                      disease=settings['disease'], **kwargs)
+            sim.island.set_state({name: data[name] for name in data.files}, settings)
+        sim._year = settings['sim_year']
+        return sim
+
+    @property
+    def parallel_times(self):
+        """Wall time in seconds spent in the workers ('parallel') and in the
+        rest of the annual cycles ('serial'), or None without workers."""
+
+        return None if self._parallel is None else dict(self._parallel.times)
+
+    def close(self):
+        """Stops the worker processes of a parallel simulation."""
+
+        if self._parallel is not None:
+            self._parallel.close()
+            self._parallel = None
+
+    def _get_graphics(self):
+        """Creates the graphics on first use, so headless runs never import matplotlib.
+
+        :returns: Graphics object for the simulation
+        """
+
+        if self._graphics is None:
+            from .graphics import Graphics
+            self._graphics = Graphics(self.hist_specs, self.cmax_animals,
+                                      self.ymax_animals, self.img_name, self.img_fmt)
+        return self._graphics
 
     def add_population(self, population):
         """Add a population to the island.
@@ -159,17 +382,14 @@ class BioSim:
     @property
     def num_animals(self):
         """Total number of animals on the island."""
-        total_num = (self.island.get_pop_info()[2] +
-                     self.island.get_pop_info()[3])
-        return total_num
+        return sum(self.island.get_totals())
 
     @property
     def num_animals_per_species(self):
         """Number of animals per species in island, as dictionary."""
-        num_animal_dict = {'Herbivore': self.island.get_pop_info()[2],
-                           'Carnivore': self.island.get_pop_info()[3]}
-        return num_animal_dict
+        num_herbs, num_carns = self.island.get_totals()
+        return {'Herbivore': num_herbs, 'Carnivore': num_carns}
 
     def make_movie(self):
         """Create MPEG4 movie from visualization images saved."""
-        return self._graphics.make_movie("mp4")
+        return self._get_graphics().make_movie("mp4")
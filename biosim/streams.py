@@ -0,0 +1,273 @@
+import numpy as np
+
+__author__ = "Sara Idris & Thorbjørn L Onsaker, NMBU"
+__email__ = "said@nmbu.no & thon@nmbu.no"
+
+# Phases of the annual cycle that draw random numbers, each with its own streams
+PHASES = {'pyvid': 0, 'graze': 1, 'hunt': 2,
+          'Herbivore birth': 3, 'Carnivore birth': 4,
+          'Herbivore migration': 5, 'Carnivore migration': 6,
+          'Herbivore death': 7, 'Carnivore death': 8}
+
+_GAMMA = np.uint64(0x9E3779B97F4A7C15)
+_MUL1 = np.uint64(0xBF58476D1CE4E5B9)
+_MUL2 = np.uint64(0x94D049BB133111EB)
+
+
+def splitmix64(x):
+    """Mixes 64 bit integers with the SplitMix64 finalizer.
+
+    A counter fed through this function gives a stream of random bits,
+    so the n-th value of a stream can be computed without the n-1 before it.
+
+    :param x: uint64 array
+    :returns: uint64 array with mixed values
+    """
+
+    x = np.atleast_1d(np.asarray(x, dtype=np.uint64))
+    x = (x ^ (x >> np.uint64(30))) * _MUL1
+    x = (x ^ (x >> np.uint64(27))) * _MUL2
+    return x ^ (x >> np.uint64(31))
+
+
+def to_uniform(bits):
+    """Turns random 64 bit integers into floats in [0, 1).
+
+    :param bits: uint64 array
+    :returns: float64 array
+    """
+
+    return (bits >> np.uint64(11)).astype(np.float64) * 2.0 ** -53
+
+
+def _combine(key, value):
+    """Mixes a value into a key.
+
+    :param key: uint64 array or scalar
+    :param value: integer array or scalar
+    :returns: uint64 array
+    """
+
+    value = np.atleast_1d(np.asarray(value).astype(np.uint64)) + _GAMMA
+    return splitmix64(np.asarray(key, dtype=np.uint64) ^ splitmix64(value))
+
+
+def _draw(keys, counters):
+    """The values at the given positions of the streams with the given keys."""
+
+    return to_uniform(splitmix64(keys + counters.astype(np.uint64) * _GAMMA))
+
+
+class Streams:
+    """Counter-based random streams for one simulation.
+
+    Every (year, phase, cell) has its own stream, computed from the seed and
+    the key alone. The draws for a cell therefore do not depend on which
+    other cells are visited, or in which order or in which process.
+    """
+
+    def __init__(self, seed, offset=0):
+        """
+        :param seed: integer seed of the simulation
+        :param offset: added to all cell indices, for streams of a part of the
+                       map where cells are counted from the start of the part
+        """
+
+        self.seed = int(seed) % 2 ** 64
+        self.offset = offset
+
+    def keys(self, year, phase, cells):
+        """Keys of the streams for the given cells.
+
+        :param year: number of annual cycles run before this one
+        :param phase: name of the phase, see PHASES
+        :param cells: array with flat cell indices
+        :returns: uint64 array with one key per cell
+        """
+
+        key = _combine(_combine(self.seed, year), PHASES[phase])
+        return _combine(key, np.asarray(cells, dtype=np.int64) + self.offset)
+
+    def stream(self, year, phase, cell, key=None):
+        """Stream of one cell, for draws made one after another.
+
+        :param key: key from :meth:`keys`, computed if None
+        :returns: CellStream
+        """
+
+        if key is None:
+            key = self.keys(year, phase, [cell])[0]
+        return CellStream(key)
+
+    def animals(self, year, phase, cells):
+        """Streams for each animal, keyed by its cell and its rank within the cell.
+
+        :param year: number of annual cycles run before this one
+        :param phase: name of the phase, see PHASES
+        :param cells: cell of each animal, in the order of the store
+        :returns: AnimalStreams
+        """
+
+        cells = np.asarray(cells)
+        order = np.argsort(cells, kind='stable')
+        sorted_cells = cells[order]
+        rank = np.empty(len(cells), dtype=np.int64)
+        rank[order] = np.arange(len(cells)) - np.searchsorted(sorted_cells, sorted_cells)
+        return AnimalStreams(_combine(self.keys(year, phase, cells), rank))
+
+
+class CellStream:
+    """Stream of uniform numbers for one key.
+
+    Has the random() method of numpy.random.Generator, so it can be used
+    where the kernels draw numbers one block at a time. Values are computed
+    ahead in blocks; since each value only depends on its position, this
+    does not change the values.
+    """
+
+    # Number of values computed at a time
+    _BLOCK = 256
+
+    def __init__(self, key):
+        """
+        :param key: uint64 key of the stream
+        """
+
+        self.key = np.uint64(key)
+        self.counter = 0
+        self._start = 0
+        self._buffer = np.empty(0)
+
+    def random(self, size=None):
+        """Next values of the stream.
+
+        :param size: number of values; a single float if None
+        :returns: float or array with floats in [0, 1)
+        """
+
+        num = 1 if size is None else size
+        if self.counter + num > self._start + len(self._buffer):
+            self._start = self.counter
+            self._buffer = _draw(self.key, np.arange(self.counter,
+                                                     self.counter + max(num, self._BLOCK)))
+        pos = self.counter - self._start
+        self.counter += num
+        return self._buffer[pos] if size is None else self._buffer[pos:pos + num]
+
+
+class AnimalStreams:
+    """One stream per animal, for draws made for many animals at once.
+
+    Each animal has its own counter, so an animal gets the same numbers
+    whether it is drawn for alone or together with others.
+    """
+
+    def __init__(self, keys, counters=None):
+        """
+        :param keys: uint64 array with the key of each animal
+        :param counters: position in the stream of each animal; zeros if None
+        """
+
+        self.keys = keys
+        self.counters = np.zeros(len(keys), dtype=np.int64) if counters is None else counters
+
+    def __len__(self):
+        return len(self.keys)
+
+    def random(self, index=None):
+        """Next uniform number for each animal.
+
+        :param index: rows to draw for; all if None
+        :returns: array with floats in [0, 1)
+        """
+
+        if index is None:
+            index = slice(None)
+        values = _draw(self.keys[index], self.counters[index])
+        self.counters[index] += 1
+        return values
+
+    def normal(self, mean, sd, index=None):
+        """Next normally distributed number for each animal, by the Box-Muller method.
+
+        :returns: array with values
+        """
+
+        radius = np.sqrt(-2 * np.log1p(-self.random(index)))
+        return mean + sd * radius * np.cos(2 * np.pi * self.random(index))
+
+    def integers(self, high, index=None):
+        """Next integer in [0, high) for each animal.
+
+        :returns: integer array
+        """
+
+        return np.minimum((self.random(index) * high).astype(np.int64), high - 1)
+
+    def permutation(self):
+        """Random order of the animals.
+
+        :returns: integer array with the rows in random order
+        """
+
+        return np.argsort(self.random(), kind='stable')
+
+    def subset(self, index):
+        """Streams for some of the animals, which continue where they are.
+
+        :param index: integer array with rows
+        :returns: AnimalStreams
+        """
+
+        return AnimalStreams(self.keys[index], self.counters[index].copy())
+
+
+class GeneratorDraws:
+    """Draws from a numpy random generator, with the methods of AnimalStreams.
+
+    Lets the kernels be used with a single generator, drawing values in
+    the same order as the generator's own methods would.
+    """
+
+    def __init__(self, rng, num):
+        """
+        :param rng: numpy random generator
+        :param num: number of animals
+        """
+
+        self.rng = rng
+        self.num = num
+
+    def __len__(self):
+        return self.num
+
+    def _size(self, index):
+        return self.num if index is None else len(index)
+
+    def random(self, index=None):
+        return self.rng.random(self._size(index))
+
+    def normal(self, mean, sd, index=None):
+        return self.rng.normal(mean, sd, self._size(index))
+
+    def integers(self, high, index=None):
+        return self.rng.integers(0, high, self._size(index))
+
+    def permutation(self):
+        return self.rng.permutation(self.num)
+
+    def subset(self, index):
+        return GeneratorDraws(self.rng, len(index))
+
+
+def animal_draws(rng, num):
+    """Draws for num animals from a generator or from animal streams.
+
+    :param rng: numpy random generator, or AnimalStreams for num animals
+    :param num: number of animals
+    :returns: AnimalStreams or GeneratorDraws
+    """
+
+    if isinstance(rng, np.random.Generator):
+        return GeneratorDraws(rng, num)
+    return rng
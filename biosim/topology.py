@@ -0,0 +1,116 @@
+import numpy as np
+
+__author__ = "Sara Idris & Thorbjørn L Onsaker, NMBU"
+__email__ = "said@nmbu.no & thon@nmbu.no"
+
+
+class Topology:
+    """Precomputed neighbour index for the cells of a map.
+
+    Cells have flat IDs numbered row by row (row * number of columns + column).
+
+        neighbours: numpy array (int32) with shape (number of cells, degree)
+            ID of each neighbour cell, -1 where the neighbour is outside the map.
+        habitable: numpy array (bool)
+            True for cells animals can live in.
+        allowed: numpy array (bool) with the same shape as neighbours
+            True where an animal may move to the neighbour.
+
+    Every cell has the same number of neighbour slots, so the table is also a
+    compressed sparse row (CSR) adjacency with a fixed row length: the
+    neighbours of cell i are indices[indptr[i]:indptr[i + 1]].
+    """
+
+    # Row and column steps to the north, south, east and west neighbour
+    _SQUARE_STEPS = ((-1, 0), (1, 0), (0, 1), (0, -1))
+
+    # Steps to the six neighbours in an "odd-r" hexagonal layout,
+    # where odd rows are shifted half a cell to the right
+    _HEX_STEPS = {0: ((-1, -1), (-1, 0), (0, 1), (1, 0), (1, -1), (0, -1)),
+                  1: ((-1, 0), (-1, 1), (0, 1), (1, 1), (1, 0), (0, -1))}
+
+    def __init__(self, neighbours, habitable, shape):
+        """
+        :param neighbours: integer array with neighbour IDs, -1 for no neighbour
+        :param habitable: boolean array with one value per cell
+        :param shape: tuple with number of rows and columns on the map
+        """
+
+        self.neighbours = np.asarray(neighbours, dtype=np.int32)
+        self.habitable = np.asarray(habitable, dtype=bool)
+        self.shape = shape
+        self.allowed = (self.neighbours >= 0) & self.habitable[self.neighbours]
+
+    @classmethod
+    def square(cls, habitable, shape, wrap=False):
+        """Square grid where each cell has a north, south, east and west neighbour.
+
+        :param habitable: boolean array with one value per cell
+        :param shape: tuple with number of rows and columns on the map
+        :param wrap: if True, the edges of the map wrap around
+        :returns: Topology for the grid
+        """
+
+        row, col = np.divmod(np.arange(shape[0] * shape[1]), shape[1])
+        steps = {0: cls._SQUARE_STEPS, 1: cls._SQUARE_STEPS}
+        return cls(cls._grid_neighbours(row, col, steps, shape, wrap), habitable, shape)
+
+    @classmethod
+    def hexagonal(cls, habitable, shape, wrap=False):
+        """Hexagonal grid where each cell has six neighbours.
+
+        :param habitable: boolean array with one value per cell
+        :param shape: tuple with number of rows and columns on the map
+        :param wrap: if True, the edges of the map wrap around
+        :returns: Topology for the grid
+        """
+
+        row, col = np.divmod(np.arange(shape[0] * shape[1]), shape[1])
+        return cls(cls._grid_neighbours(row, col, cls._HEX_STEPS, shape, wrap),
+                   habitable, shape)
+
+    @staticmethod
+    def _grid_neighbours(row, col, steps, shape, wrap):
+        """Builds the neighbour table from row and column steps.
+
+        :param steps: dictionary with steps for even (0) and odd (1) rows
+        :returns: integer array with one row of neighbour IDs per cell
+        """
+
+        parity = row % 2
+        row_steps = np.array([[step[0] for step in steps[p]] for p in (0, 1)])[parity]
+        col_steps = np.array([[step[1] for step in steps[p]] for p in (0, 1)])[parity]
+        rows = row[:, np.newaxis] + row_steps
+        cols = col[:, np.newaxis] + col_steps
+        if wrap:
+            rows %= shape[0]
+            cols %= shape[1]
+        inside = (rows >= 0) & (rows < shape[0]) & (cols >= 0) & (cols < shape[1])
+        return np.where(inside, rows * shape[1] + cols, -1)
+
+    @property
+    def num_cells(self):
+        """Number of cells on the map."""
+
+        return len(self.neighbours)
+
+    @property
+    def degree(self):
+        """Number of neighbour slots per cell."""
+
+        return self.neighbours.shape[1]
+
+    @property
+    def indptr(self):
+        """Start of each cell's neighbours in indices, in CSR form."""
+
+        return np.arange(0, self.num_cells * self.degree + 1, self.degree, dtype=np.int32)
+
+    @property
+    def indices(self):
+        """Neighbour IDs of all cells after each other, in CSR form."""
+
+        return self.neighbours.ravel()
+
+
+TOPOLOGIES = {'square': Topology.square, 'hexagonal': Topology.hexagonal}
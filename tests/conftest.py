@@ -0,0 +1,22 @@
+import pytest
+
+"""Fixtures shared by the test modules."""
+
+__author__ = "Sara Idris & Thorbjørn L Onsaker, NMBU"
+__email__ = "said@nmbu.no & thon@nmbu.no"
+
+
+@pytest.fixture
+def island_map():
+    """Island with three cells of lowland and one of highland."""
+
+    return "WWWW\nWLLW\nWLHW\nWWWW"
+
+
+@pytest.fixture
+def ini_pop():
+    """50 herbivores and 10 carnivores of age 5 and weight 20 in cell (2, 2)."""
+
+    return [{'loc': (2, 2),
+             'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20} for _ in range(50)] +
+                    [{'species': 'Carnivore', 'age': 5, 'weight': 20} for _ in range(10)]}]
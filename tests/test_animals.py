@@ -2,6 +2,7 @@ from biosim.animals import Animal, Herbivore, Carnivore
 import pytest
 import random
 from scipy.stats import normaltest
+from math import exp
 
 random.seed(123456)
 
@@ -208,3 +209,41 @@ def test_weight_normal_distributed():
     result_carn = normaltest(carn_weights)
     assert alpha < result_herb[1]
     assert alpha < result_carn[1]
+
+
+def test_fitness_is_cached(mocker):
+    """Test that get_fitness only computes the exponentials once while nothing changes."""
+
+    h = Herbivore(5, 20)
+    spy = mocker.patch('biosim.animals.exp', wraps=exp)
+    for _ in range(10):
+        h.get_fitness()
+    assert spy.call_count == 2
+
+
+def test_fitness_updated_after_changes():
+    """Test that cached fitness is recomputed after aging, weight loss and eating."""
+
+    h = Herbivore(5, 20)
+    fitness = h.get_fitness()
+    h.aging()
+    assert h.get_fitness() < fitness
+    fitness = h.get_fitness()
+    h.weight_loss()
+    assert h.get_fitness() < fitness
+    fitness = h.get_fitness()
+    h.consumed_fodder(10)
+    assert h.get_fitness() > fitness
+
+
+@pytest.mark.parametrize('set_params', [{'w_half': 30.0}], indirect=True)
+def test_fitness_updated_after_set_params(set_params):
+    """Test that set_params flushes cached fitness for the species."""
+
+    h = Herbivore(5, 20)
+    c = Carnivore(5, 20)
+    herb_fitness = h.get_fitness()
+    carn_fitness = c.get_fitness()
+    Herbivore.set_params({'w_half': 10.0})
+    assert h.get_fitness() > herb_fitness
+    assert c.get_fitness() == carn_fitness
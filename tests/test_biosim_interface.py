@@ -155,11 +155,12 @@ def test_initial_population():
 
 
 @pytest.fixture
-def plain_sim():
+def plain_sim(tmp_path):
     """Return a simple island for used in various tests below"""
     return BioSim(island_map="WWWW\nWLHW\nWWWW",
                   ini_pop=[],
-                  seed=1)
+                  seed=1,
+                  img_base=str(tmp_path / 'bs'))
 
 
 def test_add_population(plain_sim):
@@ -0,0 +1,85 @@
+from biosim.cache import ResultCache, scenario_hash, scenario_params
+from biosim.simulation import BioSim
+import numpy as np
+import os
+import pytest
+
+"""Various tests made for the ResultCache class."""
+
+__author__ = "Sara Idris & Thorbjørn L Onsaker, NMBU"
+__email__ = "said@nmbu.no & thon@nmbu.no"
+
+
+class TestResultCache:
+    """Test class for the ResultCache class."""
+
+    @pytest.fixture
+    def loads(self, monkeypatch):
+        """Years of the checkpoints loaded by the cache."""
+
+        years = []
+        load = BioSim.load_checkpoint.__func__
+
+        def load_checkpoint(cls, filename, **kwargs):
+            sim = load(cls, filename, **kwargs)
+            years.append(sim.year)
+            return sim
+        monkeypatch.setattr(BioSim, 'load_checkpoint', classmethod(load_checkpoint))
+        return years
+
+    def test_scenario_hash(self, island_map, ini_pop):
+        """Test that the hash is stable, and changes with seed and parameters."""
+
+        key = scenario_hash(island_map, ini_pop, 1)
+        assert key == scenario_hash(island_map, ini_pop, 1, params=scenario_params())
+        assert key != scenario_hash(island_map, ini_pop, 2)
+        assert key != scenario_hash(island_map, ini_pop, 1,
+                                    params=scenario_params({'Herbivore': {'F': 5.0}}))
+
+    def test_resumes_from_longest_prefix(self, tmp_path, loads, island_map, ini_pop):
+        """Test that runs resume from the latest checkpoint and give the uncached result."""
+
+        cache = ResultCache(tmp_path, checkpoint_years=10)
+        cache.run(island_map, ini_pop, 3, 25, animal_params={'Carnivore': {'F': 30.0}})
+        assert loads == []
+        sim, series = cache.run(island_map, ini_pop, 3, 32,
+                                animal_params={'Carnivore': {'F': 30.0}})
+        assert loads == [25]
+        sim_short, series_short = cache.run(island_map, ini_pop, 3, 15,
+                                            animal_params={'Carnivore': {'F': 30.0}})
+        assert loads == [25, 10]
+
+        reference = BioSim(island_map, ini_pop, 3)
+        reference.set_animal_parameters('Carnivore', {'F': 30.0})
+        counts = [record.num_herbivores for record in reference.iter_years(32)]
+        assert series['year'].tolist() == list(range(1, 33))
+        assert series['herbivores'].tolist() == counts
+        assert series_short['herbivores'].tolist() == counts[:15]
+        for pop, expected in ((sim.island.herbs, reference.island.herbs),
+                              (sim.island.carns, reference.island.carns)):
+            assert np.array_equal(pop.weight, expected.weight)
+
+    def test_lru_eviction(self, tmp_path, island_map, ini_pop):
+        """Test that the least recently used checkpoints are removed when the cache is full."""
+
+        cache = ResultCache(tmp_path, checkpoint_years=5)
+        cache.run(island_map, ini_pop, 1, 10)
+        first = os.listdir(tmp_path)[0]
+        cache.max_bytes = cache.size()
+        cache.run(island_map, ini_pop, 2, 10)
+        assert cache.size() <= cache.max_bytes
+        assert first not in os.listdir(tmp_path)
+        assert len(os.listdir(tmp_path)) == 1
+
+    def test_stray_files_skipped(self, tmp_path, island_map, ini_pop):
+        """Test that files in the cache directory that are not scenarios are left alone."""
+
+        (tmp_path / '.DS_Store').write_bytes(b'x' * 100)
+        cache = ResultCache(tmp_path, checkpoint_years=5)
+        cache.run(island_map, ini_pop, 1, 10)
+        folder = next(path for path in tmp_path.iterdir() if path.is_dir())
+        (folder / '0000000010.npz.tmp').write_bytes(b'x')
+        cache.max_bytes = 0
+        cache.run(island_map, ini_pop, 2, 10)
+        assert cache.size() == 0
+        assert os.listdir(tmp_path) == ['.DS_Store']
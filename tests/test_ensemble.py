@@ -0,0 +1,53 @@
+from biosim.animals import Herbivore
+from biosim.ensemble import Ensemble
+import numpy as np
+import pytest
+
+"""Various tests made for the Ensemble class."""
+
+__author__ = "Sara Idris & Thorbjørn L Onsaker, NMBU"
+__email__ = "said@nmbu.no & thon@nmbu.no"
+
+
+class TestEnsemble:
+    """Test class for the Ensemble class."""
+
+    @pytest.fixture
+    def ensemble(self):
+        ini_pop = [{'loc': (2, 2),
+                    'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20}
+                            for _ in range(30)] +
+                           [{'species': 'Carnivore', 'age': 5, 'weight': 20}
+                            for _ in range(5)]}]
+        return Ensemble('WWWW\nWLHW\nWWWW', ini_pop, 6,
+                        animal_params={'Herbivore': {'F': 8.0}})
+
+    def test_counts_shape(self, ensemble):
+        """Test that there is one row per seed and one column per year."""
+
+        result = ensemble.run([1, 2, 3], workers=1)
+        assert result.counts['Herbivore'].shape == (3, 6)
+        assert list(result.years) == [1, 2, 3, 4, 5, 6]
+        assert result.mean('Carnivore').shape == (6,)
+        assert result.quantile([0.1, 0.9], 'Herbivore').shape == (2, 6)
+
+    def test_same_result_for_any_worker_count(self, ensemble):
+        """Test that the counts do not depend on the number of worker processes."""
+
+        serial = ensemble.run([1, 2, 3, 4], workers=1)
+        parallel = ensemble.run([1, 2, 3, 4], workers=2)
+        for species in ('Herbivore', 'Carnivore'):
+            assert np.array_equal(serial.counts[species], parallel.counts[species])
+
+    def test_seed_decides_result(self, ensemble):
+        """Test that a run only depends on its seed, not on earlier runs."""
+
+        result = ensemble.run([1, 2, 1], workers=1)
+        assert np.array_equal(result.counts['Herbivore'][0], result.counts['Herbivore'][2])
+
+    def test_params_restored(self, ensemble):
+        """Test that parameter overrides do not leak out of the runs."""
+
+        before = dict(Herbivore.params)
+        ensemble.run([1], workers=1)
+        assert Herbivore.params == before
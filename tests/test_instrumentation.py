@@ -0,0 +1,78 @@
+from biosim.instrumentation import PhaseLog
+from biosim.simulation import BioSim
+import numpy as np
+import pytest
+
+"""Various tests made for the PhaseLog class."""
+
+__author__ = "Sara Idris & Thorbjørn L Onsaker, NMBU"
+__email__ = "said@nmbu.no & thon@nmbu.no"
+
+
+class TestPhaseLog:
+    """Test class for the PhaseLog class."""
+
+    @pytest.fixture
+    def logged_biosim(self, island_map, ini_pop):
+        sim = BioSim(island_map, ini_pop, 1, log_phases=True)
+        sim.simulate(4, vis_years=None)
+        return sim
+
+    def test_rows_per_year(self, logged_biosim):
+        """Test that every phase is recorded once per annual cycle."""
+
+        records = logged_biosim.phase_log
+        assert len(records) == 5 * 7
+        assert list(records['phase'][:7]) == ['update_fodder', 'graze', 'hunt',
+                                              'herbivore birth', 'carnivore birth',
+                                              'migration', 'end_of_year']
+        assert (records['time'] >= 0).all()
+
+    def test_counters_add_up(self, logged_biosim):
+        """Test that births minus deaths and kills give the change in population."""
+
+        records = logged_biosim.phase_log
+        change = records['births'].sum() - records['deaths'].sum() - records['kills'].sum()
+        assert change == logged_biosim.num_animals - 60
+        assert records['cells'][records['phase'] == 'update_fodder'].tolist() == [4] * 5
+
+    def test_counters_add_up_in_parallel(self, logged_biosim, island_map, ini_pop):
+        """Test that parallel feeding logs the same births and kills as the serial phases."""
+
+        sim = BioSim(island_map, ini_pop, 1, log_phases=True, workers=2, threads=True)
+        sim.simulate(4, vis_years=None)
+        sim.close()
+        records = sim.phase_log
+        for counter in ('births', 'deaths', 'kills'):
+            assert records[counter].sum() == logged_biosim.phase_log[counter].sum()
+        assert records['births'].sum() > 0
+        change = records['births'].sum() - records['deaths'].sum() - records['kills'].sum()
+        assert change == sim.num_animals - 60
+
+    def test_not_recorded_by_default(self):
+        """Test that there is no phase log unless asked for."""
+
+        sim = BioSim('WWW\nWLW\nWWW', [], 1)
+        assert sim.phase_log is None
+        with pytest.raises(ValueError):
+            sim.save_phase_log('log.csv')
+
+    @pytest.mark.parametrize('filename', ['log.csv', 'log.npz'])
+    def test_save(self, logged_biosim, tmp_path, filename):
+        """Test that the log can be saved as CSV and NPZ."""
+
+        path = tmp_path / filename
+        logged_biosim.save_phase_log(str(path))
+        if filename.endswith('.npz'):
+            data = np.load(path)
+            assert np.array_equal(data['kills'], logged_biosim.phase_log['kills'])
+        else:
+            lines = path.read_text().splitlines()
+            assert lines[0] == ','.join(PhaseLog.DTYPE.names)
+            assert len(lines) == 1 + len(logged_biosim.phase_log)
+
+    def test_summary(self, logged_biosim):
+        """Test that the summary sums the counters of each phase."""
+
+        summary = logged_biosim.island.phase_log.summary()
+        assert summary['hunt']['kills'] == logged_biosim.phase_log['kills'].sum()
@@ -64,3 +64,99 @@ class TestRossumIsland:
 
         with pytest.raises(ValueError):
             RossumIsland('')
+
+    def test_map_letters(self, example_island):
+        """Test that habitable and fodder cells are derived from the letters of the map."""
+
+        assert example_island.map.shape == (11, 11)
+        assert example_island.map[4, 4] == b'W'
+        assert example_island.habitable.sum() == 81 - 4
+        fodder_cells = {land_type.__name__: len(cells)
+                        for land_type, cells in example_island.fodder_cells.items()}
+        assert fodder_cells == {'Lowland': 37, 'Highland': 24}
+
+    @pytest.mark.parametrize('island_map', ['WWW\nWXW\nWWW', 'WWW\nWLW\nWLW',
+                                            'WWW\nWLLW\nWWW'])
+    def test_invalid_map(self, island_map):
+        """Test that unknown letters, land on the edge and uneven rows raise ValueError."""
+
+        with pytest.raises(ValueError):
+            RossumIsland(island_map)
+
+    def test_insert_population_in_store(self, example_island):
+        """Test that inserted animals end up in the population stores."""
+
+        ini_pop = [{'loc': (2, 3),
+                    'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20}
+                            for _ in range(50)] +
+                           [{'species': 'Carnivore', 'age': 5, 'weight': 20}
+                            for _ in range(20)]}]
+        example_island.insert_population(ini_pop)
+        herb_array, carn_array, sum_herb, sum_carn = example_island.get_pop_info()
+        assert herb_array[1][2] == 50
+        assert carn_array[1][2] == 20
+        assert (sum_herb, sum_carn) == (50, 20)
+        herbs, carns = example_island.get_cell_animals((2, 3))
+        assert len(herbs) == 50 and len(carns) == 20
+
+    def test_annual_cycle_keeps_animals_on_land(self, example_island):
+        """Test that animals never end up in water cells during annual cycles."""
+
+        ini_pop = [{'loc': (6, 6),
+                    'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20}
+                            for _ in range(100)] +
+                           [{'species': 'Carnivore', 'age': 5, 'weight': 20}
+                            for _ in range(20)]}]
+        example_island.insert_population(ini_pop)
+        for _ in range(20):
+            example_island.annual_cycle()
+        herb_array, carn_array, _, _ = example_island.get_pop_info()
+        assert (herb_array.ravel() == example_island.herbs.counts()).all()
+        assert (carn_array.ravel() == example_island.carns.counts()).all()
+        water = ~example_island.habitable.reshape(herb_array.shape)
+        assert herb_array[water].sum() == 0
+        assert carn_array[water].sum() == 0
+
+    @pytest.mark.parametrize('topology', ['square', 'hexagonal'])
+    def test_topologies(self, topology):
+        """Test that animals spread on both square and hexagonal islands."""
+
+        island = RossumIsland("WWWWW\nWLLLW\nWLLLW\nWLLLW\nWWWWW", topology=topology)
+        island.insert_population([{'loc': (3, 3),
+                                   'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20}
+                                           for _ in range(100)]}])
+        island.annual_cycle()
+        herb_array = island.get_pop_info()[0]
+        assert (herb_array > 0).sum() > 1
+        assert herb_array[~island.habitable.reshape(5, 5)].sum() == 0
+
+    def test_unknown_topology(self):
+        """Test that an unknown topology raises ValueError."""
+
+        with pytest.raises(ValueError):
+            RossumIsland("WWW\nWLW\nWWW", topology='triangular')
+
+    def test_pop_info_views(self, example_island):
+        """Test that get_pop_info returns read-only views of the live count matrix."""
+
+        herb_array, carn_array, _, _ = example_island.get_pop_info()
+        example_island.insert_population([{'loc': (2, 2),
+                                           'pop': [{'species': 'Carnivore', 'age': 5,
+                                                    'weight': 20}]}])
+        assert carn_array[1][1] == 1
+        assert example_island.get_totals() == (0, 1)
+        with pytest.raises(ValueError):
+            herb_array[1][1] = 5
+
+    @pytest.mark.parametrize('seed, same', [(1, True), (2, False)])
+    def test_seed_decides_result(self, seed, same, island_map, ini_pop):
+        """Test that islands with the same seed give the same result, and different seeds do not."""
+
+        islands = [RossumIsland(island_map, seed=s) for s in (1, seed)]
+        for island in islands:
+            island.insert_population(ini_pop)
+            for _ in range(5):
+                island.annual_cycle()
+        weights = [island.herbs.weight for island in islands]
+        assert (len(weights[0]) == len(weights[1]) and
+                (weights[0] == weights[1]).all()) == same
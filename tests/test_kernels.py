@@ -0,0 +1,199 @@
+from biosim.kernels import (birth, end_of_year, fitness, graze, migrate, predation,
+                            truncated_normal)
+from biosim.animals import Herbivore, Carnivore
+from biosim.topology import Topology
+import numpy as np
+import pytest
+
+"""Various tests made for the vectorized kernels."""
+
+__author__ = "Sara Idris & Thorbjørn L Onsaker, NMBU"
+__email__ = "said@nmbu.no & thon@nmbu.no"
+
+
+@pytest.fixture
+def rng():
+    """Creates a seeded numpy random generator."""
+    return np.random.default_rng(123456)
+
+
+@pytest.fixture
+def certain_kill():
+    """Parameters for carnivores that kill every weaker herbivore."""
+    return {**Carnivore.params, 'DeltaPhiMax': 1e-9}
+
+
+def test_fitness_same_as_animal():
+    """Test that the vectorized fitness equals get_fitness of animal objects."""
+
+    ages = [0, 5, 30, 80]
+    weights = [1.0, 20.0, 35.0, 0.0]
+    expected = [Herbivore(age, weight).get_fitness() if weight > 0 else 0
+                for age, weight in zip(ages, weights)]
+    assert fitness(ages, weights, Herbivore.params) == pytest.approx(expected)
+
+
+@pytest.mark.parametrize('num_herbs, f_max', [(100, 805.0), (50, 800.0), (70, 0.0)])
+def test_graze_same_as_sequential(num_herbs, f_max):
+    """
+    Test that batched grazing gives exactly the same amounts as letting
+    the herbivores eat one by one in the same random order.
+    """
+
+    params = Herbivore.params
+    eaten = graze(np.zeros(num_herbs, dtype=int), np.array([f_max]), params,
+                  np.random.default_rng(1))
+
+    expected = np.zeros(num_herbs)
+    fodder = f_max
+    for herb in np.random.default_rng(1).permutation(num_herbs):
+        if fodder <= 0:
+            break
+        expected[herb] = min(params['F'], fodder)
+        fodder -= expected[herb]
+    assert np.array_equal(eaten, expected)
+
+
+def test_graze_many_cells(rng):
+    """Test that fodder is shared within each cell and updated per cell."""
+
+    cell = np.repeat([0, 2, 3], [5, 100, 1])
+    fodder = np.array([800.0, 800.0, 300.0, 5.0])
+    eaten = graze(cell, fodder, Herbivore.params, rng)
+    assert eaten[cell == 0].tolist() == [10.0] * 5
+    assert eaten[cell == 2].sum() == 300.0
+    assert eaten[cell == 3].tolist() == [5.0]
+    assert fodder.tolist() == [750.0, 800.0, 0.0, 0.0]
+
+
+def test_truncated_normal_positive(rng):
+    """Test that truncated normal values are positive even with a large spread."""
+
+    assert (truncated_normal(6.0, 10.0, 1000, rng) > 0).all()
+
+
+def test_birth_certain(rng):
+    """
+    Test that all heavy and fit animals give birth when the birth probability
+    is at least 1, and that animals alone in their cell never do.
+    """
+
+    weight = np.full(100, 50.0)
+    fit = fitness(np.full(100, 5), weight, Herbivore.params)
+    mothers, offspring = birth(weight, fit, 100, Herbivore.params, rng)
+    assert len(mothers) == 100
+    assert (offspring > 0).all()
+    mothers, _ = birth(weight, fit, 1, Herbivore.params, rng)
+    assert len(mothers) == 0
+
+
+def test_birth_too_light(rng):
+    """Test that animals lighter than zeta * (w_birth + sigma_birth) never give birth."""
+
+    params = Carnivore.params
+    weight = np.full(100, 0.99 * params['zeta'] * (params['w_birth'] + params['sigma_birth']))
+    mothers, _ = birth(weight, np.ones(100), 100, params, rng)
+    assert len(mothers) == 0
+
+
+def test_end_of_year(rng):
+    """
+    Test that end_of_year ages all animals, reduces weight with eta * weight,
+    halves the weight of everyone in a crowded cell in a pyvid year and
+    always kills animals without weight.
+    """
+
+    params = {**Herbivore.params, 'omega': 0.0}
+    age = np.array([0, 5, 10])
+    weight = np.array([20.0, 20.0, 0.0])
+    phi, dies = end_of_year(age, weight, 3, params, rng)
+    assert age.tolist() == [1, 6, 11]
+    assert weight.tolist() == [19.0, 19.0, 0.0]
+    assert dies.tolist() == [False, False, True]
+    assert phi[:2] == pytest.approx(fitness(age[:2], weight[:2], params))
+
+    weight = np.array([20.0, 20.0])
+    end_of_year(np.zeros(2), weight, 100, params, rng, pyvid=True)
+    assert weight.tolist() == [10.0, 10.0]
+
+
+def test_migrate_only_to_habitable(rng):
+    """
+    Test that animals only move to habitable neighbours, also on maps
+    smaller than 3 x 3 and from cells at the edge of the map.
+    """
+
+    topology = Topology.square([True, False, True, True], (2, 2))
+    cell = np.repeat([0, 2], 500)
+    params = {**Herbivore.params, 'mu': 1.0}
+    new_cell, moved = migrate(cell, np.ones(1000), params, topology.neighbours,
+                              topology.allowed, rng)
+    assert set(new_cell[cell == 0]) == {0, 2}
+    assert set(new_cell[cell == 2]) == {0, 2, 3}
+    assert moved == (new_cell != cell).sum()
+
+
+def test_migrate_directions_equally_likely(rng):
+    """Test that the four neighbour cells are chosen with the same probability."""
+
+    topology = Topology.square(np.ones(9, dtype=bool), (3, 3))
+    out = np.empty(4000, dtype=int)
+    new_cell, moved = migrate(np.full(4000, 4), np.ones(4000), {'mu': 1.0},
+                              topology.neighbours, topology.allowed, rng, out=out)
+    assert new_cell is out
+    assert moved == 4000
+    counts = np.bincount(new_cell, minlength=9)[[1, 7, 5, 3]]
+    assert counts == pytest.approx([1000] * 4, rel=0.1)
+
+
+def test_predation_eats_until_full(rng, certain_kill):
+    """
+    Test that a carnivore kills weaker herbivores until it has eaten F,
+    and that it only gains beta times the part of the last herbivore it eats.
+    """
+
+    herb_weight = np.full(20, 10.0)
+    herb_fitness = fitness(np.full(20, 50), herb_weight, Herbivore.params)
+    carn_weight, killed = predation([5], [50.0], herb_fitness, herb_weight,
+                                    certain_kill, rng)
+    assert killed.sum() == 5
+    assert carn_weight[0] == pytest.approx(50 + certain_kill['beta'] * 50)
+
+    herb_weight = np.full(20, 30.0)
+    carn_weight, killed = predation([5], [50.0], herb_fitness, herb_weight,
+                                    certain_kill, rng)
+    assert killed.sum() == 2
+    assert carn_weight[0] == pytest.approx(50 + certain_kill['beta'] * 50)
+
+
+def test_predation_weakest_first(rng, certain_kill):
+    """Test that the herbivores with the lowest fitness are killed first."""
+
+    herb_weight = np.full(10, 10.0)
+    herb_fitness = np.linspace(0.5, 0.05, 10)
+    _, killed = predation([5], [50.0], herb_fitness, herb_weight, certain_kill, rng)
+    assert killed.tolist() == [False] * 5 + [True] * 5
+
+
+def test_predation_no_kill_of_fitter_herbivores(rng, certain_kill):
+    """Test that a carnivore never kills herbivores with higher fitness."""
+
+    herb_fitness = np.full(10, 0.99)
+    carn_weight, killed = predation([5], [10.0], herb_fitness, np.full(10, 10.0),
+                                    certain_kill, rng)
+    assert not killed.any()
+    assert carn_weight[0] == 10.0
+
+
+def test_predation_kill_probability(rng):
+    """
+    Test that the kill rate matches the probability used in consumed_herbs,
+    (fitness difference) / DeltaPhiMax, for single hunts.
+    """
+
+    params = {**Carnivore.params, 'F': 1.0}
+    carn_fitness = fitness([5], [50.0], params)[0]
+    herb_fitness = np.array([carn_fitness - 0.5])
+    kills = sum(predation([5], [50.0], herb_fitness, [10.0], params, rng)[1][0]
+                for _ in range(4000))
+    assert kills / 4000 == pytest.approx(0.5 / params['DeltaPhiMax'], abs=0.015)
@@ -173,3 +173,26 @@ class TestLandscape:
         _, p_value = chisquare(expected, observed)
 
         assert p_value > 0.01
+
+    def test_eat_all_removes_killed_herbs(self, lowland, mocker):
+        """
+        Test that eat_all removes the herbivores the carnivores kill,
+        and that the carnivores gain weight from them.
+        """
+
+        mocker.patch.dict(Carnivore.params, {'DeltaPhiMax': 1e-9})
+        lowland.list_herbs = [Herbivore(50, 10) for _ in range(20)]
+        lowland.list_carns = [Carnivore(5, 50)]
+        lowland.eat_all()
+        assert len(lowland.list_herbs) == 15
+        assert lowland.list_carns[0].weight == 50 + Carnivore.params['beta'] * 50
+
+    def test_lose_weight_counts_whole_cell(self, lowland, mocker):
+        """Test that the pyvid infection chance uses the number of animals of both species."""
+
+        lowland.list_herbs = [Herbivore(5, 20) for _ in range(30)]
+        lowland.list_carns = [Carnivore(5, 20) for _ in range(20)]
+        spy = mocker.spy(Herbivore, 'weight_loss')
+        lowland.lose_weight(pyvid=True)
+        assert spy.call_count == 30
+        assert all(call.args[2] == 50 for call in spy.call_args_list)
@@ -0,0 +1,153 @@
+from biosim.Island import RossumIsland
+from biosim.parallel import ParallelIsland
+from biosim.simulation import BioSim
+import numpy as np
+import pytest
+
+"""Various tests made for the ParallelIsland class."""
+
+__author__ = "Sara Idris & Thorbjørn L Onsaker, NMBU"
+__email__ = "said@nmbu.no & thon@nmbu.no"
+
+ISLAND_MAP = "WWWWWWW\nWLLHLLW\nWLDLLHW\nWLLLLLW\nWHHLLLW\nWWWWWWW"
+INI_POP = [{'loc': (2, 2),
+            'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20} for _ in range(80)] +
+                   [{'species': 'Carnivore', 'age': 5, 'weight': 20} for _ in range(10)]},
+           {'loc': (5, 5),
+            'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20} for _ in range(80)]}]
+
+
+def island_state(island):
+    """Columns of both stores, ordered by cell."""
+
+    state = []
+    for pop in (island.herbs, island.carns):
+        order = np.argsort(pop.cell, kind='stable')
+        state += [pop.cell[order], pop.age[order], pop.weight[order]]
+    return state
+
+
+class TestParallelIsland:
+    """Test class for the ParallelIsland class."""
+
+    @pytest.fixture
+    def serial(self):
+        island = RossumIsland(ISLAND_MAP, disease=True, seed=5)
+        island.insert_population(INI_POP)
+        for _ in range(10):
+            island.annual_cycle()
+        return island
+
+    @pytest.mark.parametrize('workers, num_strips', [(1, 1), (2, 3), (2, 5)])
+    def test_same_as_serial(self, serial, workers, num_strips):
+        """Test that the result does not depend on the number of workers and strips."""
+
+        island = RossumIsland(ISLAND_MAP, disease=True, seed=5)
+        island.insert_population(INI_POP)
+        with ParallelIsland(island, workers, num_strips) as parallel:
+            for _ in range(10):
+                parallel.annual_cycle()
+        assert island.year == serial.year
+        assert island.cycle_counts == serial.cycle_counts
+        assert np.array_equal(island.density, serial.density)
+        for column, expected in zip(island_state(island), island_state(serial)):
+            assert np.array_equal(column, expected)
+
+    @pytest.mark.parametrize('rows_per_task', [1, 2, 4])
+    def test_threads_same_as_serial(self, serial, rows_per_task):
+        """Test that a thread pool gives the same result for any chunk size."""
+
+        island = RossumIsland(ISLAND_MAP, disease=True, seed=5)
+        island.insert_population(INI_POP)
+        with ParallelIsland(island, 2, threads=True, rows_per_task=rows_per_task) as parallel:
+            for _ in range(10):
+                parallel.annual_cycle()
+            assert parallel.times['parallel'] > 0 and parallel.times['serial'] > 0
+        assert np.array_equal(island.density, serial.density)
+        for column, expected in zip(island_state(island), island_state(serial)):
+            assert np.array_equal(column, expected)
+
+    def test_animals_stay_in_workers(self, serial):
+        """Test that the animals stay in the workers until the stores are used."""
+
+        island = RossumIsland(ISLAND_MAP, disease=True, seed=5)
+        island.insert_population(INI_POP)
+        with ParallelIsland(island, 2, 3) as parallel:
+            for _ in range(5):
+                parallel.annual_cycle()
+            assert island.holder is parallel
+            totals = island.get_totals()
+            assert island.holder is parallel
+            assert totals == (int(island.density[0].sum()), int(island.density[1].sum()))
+            assert len(island.herbs) == totals[0]
+            assert island.holder is None
+            for _ in range(5):
+                parallel.annual_cycle()
+            assert island.get_pop_info()[2:] == serial.get_totals()
+        assert island.holder is None
+        assert island.cycle_counts == serial.cycle_counts
+        for column, expected in zip(island_state(island), island_state(serial)):
+            assert np.array_equal(column, expected)
+
+    def test_hexagonal_same_as_serial(self):
+        """Test that migrants crossing strips on a hexagonal grid end up as in the serial run."""
+
+        islands = [RossumIsland(ISLAND_MAP, topology='hexagonal', seed=3) for _ in range(2)]
+        for island in islands:
+            island.insert_population(INI_POP)
+        with ParallelIsland(islands[1], 2, 4, threads=True) as parallel:
+            for _ in range(8):
+                islands[0].annual_cycle()
+                parallel.annual_cycle()
+        for column, expected in zip(*(island_state(island) for island in islands)):
+            assert np.array_equal(column, expected)
+
+    def test_close_restores_fodder(self):
+        """Test that the island gets a private fodder array when the workers are stopped."""
+
+        island = RossumIsland(ISLAND_MAP, seed=5)
+        with ParallelIsland(island, 1) as parallel:
+            parallel.annual_cycle()
+        island.fodder[0] = 1.0
+        assert island.fodder.base is None
+        assert island.density.base is None
+        assert island.herbs.occupancy.base is island.density
+
+    def test_biosim_workers(self):
+        """Test that a BioSim with workers gives the same counts as without."""
+
+        serial = BioSim(ISLAND_MAP, INI_POP, 1)
+        serial.simulate(5, vis_years=None)
+        parallel = BioSim(ISLAND_MAP, INI_POP, 1, workers=2)
+        parallel.simulate(5, vis_years=None)
+        parallel.close()
+        threaded = BioSim(ISLAND_MAP, INI_POP, 1, workers=2, threads=True)
+        threaded.simulate(5, vis_years=None)
+        assert set(threaded.parallel_times) == {'parallel', 'serial'}
+        threaded.close()
+        assert parallel.num_animals_per_species == serial.num_animals_per_species
+        assert threaded.num_animals_per_species == serial.num_animals_per_species
+        assert serial.parallel_times is None
+
+    def test_biosim_stats_with_workers(self):
+        """Test that statistics taken from the workers every year leave the result unchanged."""
+
+        serial = BioSim(ISLAND_MAP, INI_POP, 1)
+        sim = BioSim(ISLAND_MAP, INI_POP, 1, workers=2)
+        for record, expected in zip(sim.iter_years(6, stats=True),
+                                    serial.iter_years(6, stats=True)):
+            assert record[:3] == expected[:3]
+            for stats, expected_stats in zip(record[5:], expected[5:]):
+                assert stats == pytest.approx(expected_stats)
+        sim.close()
+
+    def test_biosim_rows_per_task(self):
+        """Test that BioSim passes rows_per_task on to the parallel island."""
+
+        serial = BioSim(ISLAND_MAP, INI_POP, 1)
+        serial.simulate(3, vis_years=None)
+        sim = BioSim(ISLAND_MAP, INI_POP, 1, workers=2, threads=True, rows_per_task=1)
+        sim.simulate(3, vis_years=None)
+        assert len(sim._parallel.bounds) == len(ISLAND_MAP.splitlines()) + 1
+        sim.close()
+        assert sim.num_animals_per_species == serial.num_animals_per_species
@@ -0,0 +1,117 @@
+from biosim.population import Population
+from biosim.animals import Herbivore
+import numpy as np
+import pytest
+
+"""Various tests made for the Population class."""
+
+__author__ = "Sara Idris & Thorbjørn L Onsaker, NMBU"
+__email__ = "said@nmbu.no & thon@nmbu.no"
+
+
+class TestPopulation:
+    """Test class for the Population class."""
+
+    @pytest.fixture
+    def herbs(self):
+        """Creates a store with 10 herbivores in cell 3 and 5 in cell 1."""
+        pop = Population(Herbivore, 4)
+        pop.add(np.full(10, 5), np.full(10, 20.0), 3)
+        pop.add(np.full(5, 2), np.full(5, 30.0), 1)
+        return pop
+
+    def test_add(self, herbs):
+        """Test that all columns get one row per added animal."""
+
+        assert len(herbs) == 15
+        assert len(herbs.age) == len(herbs.weight) == len(herbs.cell) == len(herbs.alive)
+        assert herbs.alive.all()
+
+    def test_fitness_same_as_animal(self, herbs):
+        """Test that fitness in the store equals fitness of animal objects."""
+
+        fitness = herbs.get_fitness()
+        assert fitness[0] == pytest.approx(Herbivore(5, 20.0).get_fitness())
+        assert fitness[-1] == pytest.approx(Herbivore(2, 30.0).get_fitness())
+
+    def test_fitness_cached_until_invalidated(self, herbs):
+        """Test that fitness is only recomputed after invalidate() is called."""
+
+        before = herbs.get_fitness()
+        herbs.weight[:] = 1.0
+        assert np.array_equal(herbs.get_fitness(), before)
+        herbs.invalidate()
+        assert (herbs.get_fitness() < before).all()
+
+    def test_fitness_flushed_by_set_params(self, herbs):
+        """Test that changing species parameters makes the cached fitness stale."""
+
+        before = herbs.get_fitness()
+        Herbivore.set_params({'w_half': 30.0})
+        try:
+            after = herbs.get_fitness()
+        finally:
+            Herbivore.set_params({'w_half': 10.0})
+        assert (after < before).all()
+
+    def test_compact(self, herbs):
+        """Test that compact() removes animals that are not alive."""
+
+        herbs.alive[:4] = False
+        herbs.compact()
+        assert len(herbs) == 11
+        assert herbs.alive.all()
+
+    def test_sort_by_cell(self, herbs):
+        """Test that rows are grouped by cell and that rows_in finds each cell."""
+
+        herbs.sort_by_cell()
+        starts, stops = herbs.rows_in(np.array([1, 3]))
+        assert list(starts) == [0, 5]
+        assert list(stops) == [5, 15]
+        assert (herbs.cell[:5] == 1).all()
+
+    def test_counts(self, herbs):
+        """Test that counts() returns number of living animals per cell."""
+
+        herbs.alive[0] = False
+        assert list(herbs.counts()) == [0, 5, 0, 9]
+
+    def test_occupancy_and_active(self, herbs):
+        """
+        Test that occupancy and the active cells follow additions,
+        removals and moves without a full recount.
+        """
+
+        assert list(herbs.occupancy) == [0, 5, 0, 10]
+        assert list(herbs.active) == [1, 3]
+        herbs.alive[herbs.cell == 1] = False
+        herbs.compact()
+        assert list(herbs.active) == [3]
+        new_cells = herbs.cell_buffer()
+        new_cells[:] = herbs.cell
+        new_cells[:4] = 2
+        herbs.swap_cells(new_cells)
+        assert list(herbs.occupancy) == [0, 0, 4, 6]
+        assert list(herbs.active) == [2, 3]
+        herbs.add([1], [10.0], 0)
+        assert list(herbs.occupancy) == list(herbs.counts())
+        assert list(herbs.active) == [0, 2, 3]
+
+    def test_animals_view(self, herbs):
+        """Test that animals() returns objects with the stored age and weight."""
+
+        animals = herbs.animals(1)
+        assert len(animals) == 5
+        assert all(type(a) == Herbivore and a.age == 2 and a.weight == 30.0
+                   for a in animals)
+
+    def test_own_params(self):
+        """Test that a store with its own parameters flushes fitness on set_params only."""
+
+        pop = Population(Herbivore, 4, params=dict(Herbivore.params))
+        pop.add(np.full(3, 5), np.full(3, 20.0), 0)
+        before = pop.get_fitness()
+        pop.set_params({'w_half': 30.0})
+        assert (pop.get_fitness() < before).all()
+        assert Herbivore.params['w_half'] != 30.0
@@ -0,0 +1,94 @@
+from biosim.recorder import ColumnFile, DensityCube, Recorder, read
+from biosim.simulation import BioSim
+import numpy as np
+import pytest
+
+"""Various tests made for the Recorder class."""
+
+__author__ = "Sara Idris & Thorbjørn L Onsaker, NMBU"
+__email__ = "said@nmbu.no & thon@nmbu.no"
+
+
+class TestRecorder:
+    """Test class for the Recorder, ColumnFile and DensityCube classes."""
+
+    @pytest.fixture
+    def example_biosim(self, island_map, ini_pop):
+        return BioSim(island_map, ini_pop, 1)
+
+    def test_column_file_appends(self, tmp_path):
+        """Test that the file loads with all rows after each append."""
+
+        column = ColumnFile(tmp_path / 'a.npy', np.uint32, (2, 3))
+        column.append(np.ones((2, 2, 3)))
+        assert np.load(tmp_path / 'a.npy').shape == (2, 2, 3)
+        column.append(np.full((1, 2, 3), 7))
+        loaded = np.load(tmp_path / 'a.npy')
+        assert loaded.dtype == np.uint32
+        assert loaded[2].tolist() == [[7, 7, 7], [7, 7, 7]]
+        column.close()
+
+    def test_rows_follow_simulation(self, example_biosim, tmp_path):
+        """Test that one row is recorded per year, with the totals of the simulation."""
+
+        with Recorder(tmp_path, density=True) as recorder:
+            records = list(example_biosim.iter_years(15, recorder=recorder))
+        columns = read(tmp_path)
+        assert columns['year'].tolist() == list(range(1, 16))
+        assert columns['herbivores'].tolist() == [record.num_herbivores for record in records]
+        assert columns['herbivore_density'].shape == (15, 4, 4)
+        assert np.array_equal(columns['carnivore_density'].sum(axis=(1, 2)),
+                              columns['carnivores'])
+
+    def test_counters_add_up(self, example_biosim, tmp_path):
+        """Test that births, deaths and kills explain the change in the number of animals."""
+
+        with Recorder(tmp_path) as recorder:
+            example_biosim.simulate(10, vis_years=None, recorder=recorder)
+        columns = read(tmp_path)
+        total = columns['herbivores'] + columns['carnivores']
+        change = columns['births'] - columns['deaths'] - columns['kills']
+        assert np.array_equal(np.diff(total), change[1:])
+        assert columns['births'].sum() > 0
+
+    def test_readable_during_run(self, example_biosim, tmp_path):
+        """Test that written rows can be read before the recorder is closed."""
+
+        recorder = Recorder(tmp_path, flush_years=2)
+        example_biosim.simulate(5, vis_years=None, recorder=recorder)
+        assert len(read(tmp_path)['year']) == 4
+        recorder.close()
+        assert len(read(tmp_path)['year']) == 5
+
+    def test_density_cube(self, example_biosim, tmp_path):
+        """Test that the cube holds the same densities as the yearly records."""
+
+        cube = DensityCube.create(tmp_path / 'cube.npy', 8, (4, 4))
+        with Recorder(tmp_path / 'rows', density=True) as recorder:
+            records = list(example_biosim.iter_years(8, density=True,
+                                                     recorder=[recorder, cube]))
+        cube.close()
+        loaded = DensityCube.open(tmp_path / 'cube.npy')
+        assert loaded.cube.shape == (8, 4, 4, 2)
+        assert loaded.cube.dtype == np.uint16
+        assert loaded.years.tolist() == list(range(1, 9))
+        for record in records:
+            herbs, carns, num_herbs, num_carns = loaded.pop_info(record.year)
+            assert np.array_equal(herbs, record.herbivore_density)
+            assert np.array_equal(carns, record.carnivore_density)
+            assert num_herbs == record.num_herbivores
+            assert np.shares_memory(herbs, loaded.cube)
+        assert np.array_equal(loaded.cube[..., 0], read(tmp_path / 'rows')['herbivore_density'])
+
+    def test_density_cube_limits(self, example_biosim, tmp_path):
+        """Test that years outside the cube and counts too large for its type are refused."""
+
+        cube = DensityCube.create(tmp_path / 'cube.npy', 2, (4, 4))
+        with pytest.raises(ValueError):
+            example_biosim.simulate(3, vis_years=None, recorder=cube)
+        small = DensityCube.create(tmp_path / 'small.npy', 2, (4, 4), dtype=np.uint8,
+                                   first_year=example_biosim.year + 1)
+        example_biosim.add_population([{'loc': (2, 2), 'pop': [
+            {'species': 'Herbivore', 'age': 5, 'weight': 20} for _ in range(300)]}])
+        with pytest.raises(ValueError):
+            small.record(example_biosim.year + 1, example_biosim.island)
@@ -1,5 +1,13 @@
+from biosim.animals import Herbivore
+from biosim.landscape import Lowland
 from biosim.simulation import BioSim
+import json
+import numpy as np
 import pytest
+import random
+import os
+import subprocess
+import sys
 
 
 class TestBioSim:
@@ -22,3 +30,190 @@ class TestBioSim:
     def test_simulate_errors(self, example_biosim):
         with pytest.raises(ValueError):
             example_biosim.simulate(100, 5, 6)
+
+    def test_num_animals(self):
+        """Test that animal counts follow the population on the island."""
+
+        sim = BioSim('WWW\nWLW\nWWW',
+                     [{'loc': (2, 2),
+                       'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20}
+                               for _ in range(10)]}], 123456)
+        assert sim.num_animals == 10
+        assert sim.num_animals_per_species == {'Herbivore': 10, 'Carnivore': 0}
+
+    def test_headless_never_imports_matplotlib(self):
+        """Test that a headless simulation runs without importing matplotlib."""
+
+        code = ("import sys\n"
+                "from biosim.simulation import BioSim\n"
+                "sim = BioSim('WWW\\nWLW\\nWWW', [{'loc': (2, 2), 'pop': "
+                "[{'species': 'Herbivore', 'age': 5, 'weight': 20}]}], 1)\n"
+                "sim.simulate(5, vis_years=None)\n"
+                "assert sim.year == 5\n"
+                "assert 'matplotlib' not in sys.modules\n")
+        subprocess.run([sys.executable, '-c', code], check=True,
+                       cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    def test_graphics_import_is_lazy(self):
+        """Test that importing the graphics module does not import matplotlib."""
+
+        code = ("import sys\n"
+                "import biosim.graphics\n"
+                "assert 'matplotlib' not in sys.modules\n")
+        subprocess.run([sys.executable, '-c', code], check=True,
+                       cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    def test_headless_same_result(self, tmp_path):
+        """Test that headless and visual runs give the same population with the same seed."""
+
+        ini_pop = [{'loc': (2, 2),
+                    'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20}
+                            for _ in range(50)]}]
+        headless = BioSim('WWW\nWLW\nWWW', ini_pop, 1)
+        headless.simulate(5, vis_years=None)
+        visual = BioSim('WWW\nWLW\nWWW', ini_pop, 1, img_base=str(tmp_path / 'bs'))
+        visual.simulate(5, vis_years=100, img_years=100)
+        assert headless.num_animals == visual.num_animals
+
+    def test_headless_no_img_years(self, example_biosim):
+        with pytest.raises(ValueError):
+            example_biosim.simulate(10, vis_years=None, img_years=5)
+
+    @pytest.fixture
+    def herb_biosim(self):
+        ini_pop = [{'loc': (2, 2),
+                    'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20}
+                            for _ in range(50)]}]
+        return BioSim('WWWW\nWLLW\nWWWW', ini_pop, 1)
+
+    def test_iter_years_records(self, herb_biosim):
+        """Test that one record is yielded per year, without optional fields by default."""
+
+        records = list(herb_biosim.iter_years(4))
+        assert [record.year for record in records] == [1, 2, 3, 4]
+        assert herb_biosim.year == 4
+        assert all(record.herbivore_density is None and record.herbivore_stats is None
+                   for record in records)
+
+    def test_iter_years_density_and_stats(self, herb_biosim):
+        """Test that densities are read-only copies that add up to the totals."""
+
+        record = next(herb_biosim.iter_years(3, density=True, stats=True))
+        assert record.herbivore_density.shape == (3, 4)
+        assert record.herbivore_density.sum() == record.num_herbivores
+        assert not record.herbivore_density.flags.writeable
+        assert not np.shares_memory(record.herbivore_density, herb_biosim.island.density)
+        assert record.herbivore_stats.mean_age > 5
+        assert np.isnan(record.carnivore_stats.mean_weight)
+
+    def test_iter_years_early_stop(self, herb_biosim):
+        """Test that breaking out of the loop gives the same state as simulating fewer years."""
+
+        for record in herb_biosim.iter_years(10):
+            if record.year == 3:
+                break
+        reference = BioSim('WWWW\nWLLW\nWWWW', [{'loc': (2, 2), 'pop': [
+            {'species': 'Herbivore', 'age': 5, 'weight': 20} for _ in range(50)]}], 1)
+        reference.simulate(3, vis_years=None)
+        assert herb_biosim.year == 3
+        assert herb_biosim.num_animals == reference.num_animals
+
+    def test_parameters_owned_by_simulation(self, herb_biosim):
+        """Test that parameters set on a simulation do not change defaults or other simulations."""
+
+        default_f = Herbivore.params['F']
+        default_f_max = Lowland.d_landscape['f_max']
+        other = BioSim('WWW\nWLW\nWWW', [], 2)
+        herb_biosim.set_animal_parameters('Herbivore', {'F': 2.0})
+        herb_biosim.set_landscape_parameters('L', {'f_max': 100.0})
+        assert Herbivore.params['F'] == default_f
+        assert Lowland.d_landscape['f_max'] == default_f_max
+        assert other.island.herbs.params['F'] == default_f
+        assert herb_biosim.island.herbs.params['F'] == 2.0
+        herb_biosim.island.update_fodder()
+        other.island.update_fodder()
+        assert herb_biosim.island.fodder.max() == 100.0
+        assert other.island.fodder.max() == default_f_max
+
+    @pytest.fixture
+    def mixed_biosim(self, ini_pop):
+        return BioSim('WWWWW\nWLHLW\nWLDLW\nWWWWW', ini_pop, 7, disease=True)
+
+    def test_checkpoint_resumes_identically(self, mixed_biosim, tmp_path):
+        """Test that a simulation loaded from a checkpoint continues exactly as the original."""
+
+        mixed_biosim.set_animal_parameters('Carnivore', {'F': 30.0})
+        mixed_biosim.set_landscape_parameters('H', {'f_max': 500.0})
+        mixed_biosim.simulate(5, vis_years=None)
+        path = tmp_path / 'state.checkpoint'
+        mixed_biosim.save_checkpoint(path)
+        loaded = BioSim.load_checkpoint(path)
+        assert loaded.year == 5
+        assert loaded.island.carns.params['F'] == 30.0
+        assert loaded.island.cycle_counts == mixed_biosim.island.cycle_counts
+        mixed_biosim.simulate(10, vis_years=None)
+        loaded.simulate(10, vis_years=None)
+        for original, copy in ((mixed_biosim.island.herbs, loaded.island.herbs),
+                               (mixed_biosim.island.carns, loaded.island.carns)):
+            assert np.array_equal(original.age, copy.age)
+            assert np.array_equal(original.weight, copy.weight)
+            assert np.array_equal(original.cell, copy.cell)
+        assert np.array_equal(mixed_biosim.island.density, loaded.island.density)
+
+    def test_checkpoint_is_not_pickled(self, mixed_biosim, tmp_path):
+        """Test that a checkpoint holds plain arrays that load without pickle."""
+
+        path = tmp_path / 'state.npz'
+        mixed_biosim.save_checkpoint(path)
+        with np.load(path, allow_pickle=False) as data:
+            assert len(data['herb_age']) == 50
+            assert data['carn_weight'].dtype == np.float64
+
+    def test_checkpoint_wrong_version(self, mixed_biosim, tmp_path):
+        path = tmp_path / 'state.npz'
+        BioSim.CHECKPOINT_VERSION += 1
+        try:
+            mixed_biosim.save_checkpoint(path)
+        finally:
+            BioSim.CHECKPOINT_VERSION -= 1
+        with pytest.raises(ValueError):
+            BioSim.load_checkpoint(path)
+
+    def test_checkpoint_owned_arguments(self, mixed_biosim, tmp_path):
+        """Test that arguments decided by the checkpoint may only repeat its values."""
+
+        path = tmp_path / 'state.npz'
+        mixed_biosim.save_checkpoint(path)
+        assert BioSim.load_checkpoint(path, disease=True, seed=7).island.disease
+        with pytest.raises(ValueError):
+            BioSim.load_checkpoint(path, disease=False)
+        with pytest.raises(ValueError):
+            BioSim.load_checkpoint(path, ini_pop=[])
+
+    def test_checkpoint_version_1_refused(self, mixed_biosim, tmp_path):
+        """Test that checkpoints without the cycle counters of version 2 are refused."""
+
+        path = tmp_path / 'state.npz'
+        mixed_biosim.save_checkpoint(path)
+        with np.load(path, allow_pickle=False) as data:
+            arrays = {name: data[name] for name in data.files}
+        settings = json.loads(arrays['settings'].tobytes().decode())
+        settings['version'] = 1
+        del settings['cycle_counts']
+        arrays['settings'] = np.frombuffer(json.dumps(settings).encode(), dtype=np.uint8)
+        np.savez(path, **arrays)
+        with pytest.raises(ValueError):
+            BioSim.load_checkpoint(path)
+
+    def test_checkpoint_leaves_random_module_alone(self, mixed_biosim, tmp_path):
+        """Test that creating and loading simulations does not reseed the random module."""
+
+        path = tmp_path / 'state.npz'
+        mixed_biosim.save_checkpoint(path)
+        random.seed(99)
+        state = random.getstate()
+        BioSim('WWW\nWLW\nWWW', [], 1)
+        BioSim.load_checkpoint(path)
+        assert random.getstate() == state
+        with np.load(path, allow_pickle=False) as data:
+            assert 'random_state' not in data.files
@@ -0,0 +1,71 @@
+from biosim.kernels import graze
+from biosim.animals import Herbivore
+from biosim.streams import CellStream, Streams, splitmix64
+import numpy as np
+import pytest
+
+"""Various tests made for the random streams."""
+
+__author__ = "Sara Idris & Thorbjørn L Onsaker, NMBU"
+__email__ = "said@nmbu.no & thon@nmbu.no"
+
+
+class TestStreams:
+    """Test class for the Streams class."""
+
+    @pytest.fixture
+    def streams(self):
+        return Streams(123456)
+
+    def test_splitmix64_reference(self):
+        """Test the first value of a SplitMix64 generator seeded with 0."""
+
+        assert splitmix64(np.uint64(0x9E3779B97F4A7C15))[0] == 0xE220A8397B1DCDAF
+
+    def test_uniform(self, streams):
+        """Test that draws are in [0, 1) with mean close to 0.5."""
+
+        values = streams.stream(0, 'hunt', 3).random(10000)
+        assert ((values >= 0) & (values < 1)).all()
+        assert values.mean() == pytest.approx(0.5, abs=0.02)
+
+    def test_cell_stream_blocks(self, streams):
+        """Test that values do not depend on how many are drawn at a time."""
+
+        key = streams.keys(2, 'hunt', [7])[0]
+        whole = CellStream(key).random(600)
+        stream = CellStream(key)
+        parts = np.concatenate([stream.random(3), [stream.random()], stream.random(596)])
+        assert np.array_equal(whole, parts)
+
+    def test_keys_differ(self, streams):
+        """Test that year, phase and cell each give a different stream."""
+
+        values = [streams.stream(*key).random() for key in
+                  [(0, 'graze', 0), (1, 'graze', 0), (0, 'hunt', 0), (0, 'graze', 1)]]
+        assert len(set(values)) == 4
+
+    def test_animals_independent_of_other_cells(self, streams):
+        """Test that the draws for a cell do not depend on animals in other cells."""
+
+        both = streams.animals(4, 'Herbivore death', [0, 1, 0, 1]).random()
+        alone = streams.animals(4, 'Herbivore death', [1, 1]).random()
+        assert np.array_equal(both[[1, 3]], alone)
+
+    def test_subset_continues(self, streams):
+        """Test that a subset draws the same values as the full set would."""
+
+        draws = streams.animals(0, 'Carnivore birth', [0, 0, 1])
+        subset = draws.subset(np.array([0, 2]))
+        assert np.array_equal(subset.random(), draws.random()[[0, 2]])
+
+    def test_graze_independent_of_other_cells(self, streams):
+        """Test that grazing in a cell gives the same result without the other cells."""
+
+        cell = np.repeat([0, 1], 100)
+        fodder = np.array([300.0, 300.0])
+        eaten = graze(cell, fodder, Herbivore.params, streams.animals(0, 'graze', cell))
+        fodder = np.array([0.0, 300.0])
+        eaten_alone = graze(cell[100:], fodder, Herbivore.params,
+                            streams.animals(0, 'graze', cell[100:]))
+        assert np.array_equal(eaten[100:], eaten_alone)
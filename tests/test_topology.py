@@ -0,0 +1,57 @@
+from biosim.topology import Topology
+import numpy as np
+import pytest
+
+"""Various tests made for the Topology class."""
+
+__author__ = "Sara Idris & Thorbjørn L Onsaker, NMBU"
+__email__ = "said@nmbu.no & thon@nmbu.no"
+
+
+class TestTopology:
+    """Test class for the Topology class."""
+
+    @pytest.fixture
+    def land(self):
+        """Creates a habitable mask for a 4 x 5 map with a water border."""
+        habitable = np.zeros((4, 5), dtype=bool)
+        habitable[1:3, 1:4] = True
+        return habitable.ravel()
+
+    def test_square_neighbours(self, land):
+        """Test that cells have north, south, east and west neighbours in that order."""
+
+        topology = Topology.square(land, (4, 5))
+        assert topology.neighbours[6].tolist() == [1, 11, 7, 5]
+        assert topology.neighbours[0].tolist() == [-1, 5, 1, -1]
+
+    def test_square_wrap(self, land):
+        """Test that neighbours wrap around the edges when wrap is True."""
+
+        topology = Topology.square(land, (4, 5), wrap=True)
+        assert topology.neighbours[0].tolist() == [15, 5, 1, 4]
+
+    def test_allowed_only_habitable(self, land):
+        """Test that moves are only allowed into habitable cells on the map."""
+
+        topology = Topology.square(land, (4, 5))
+        assert topology.allowed[6].tolist() == [False, True, True, False]
+        assert not topology.allowed[0].any()
+
+    @pytest.mark.parametrize('wrap', [False, True])
+    def test_hexagonal_symmetric(self, wrap):
+        """Test that hexagonal cells have six neighbours, and that being neighbours is mutual."""
+
+        topology = Topology.hexagonal(np.ones(24, dtype=bool), (4, 6), wrap)
+        assert topology.degree == 6
+        for cell, neighbours in enumerate(topology.neighbours):
+            for neighbour in neighbours[neighbours >= 0]:
+                assert cell in topology.neighbours[neighbour]
+
+    def test_csr_form(self, land):
+        """Test that indptr and indices give the same neighbours as the table."""
+
+        topology = Topology.square(land, (4, 5))
+        indptr, indices = topology.indptr, topology.indices
+        assert len(indptr) == topology.num_cells + 1
+        assert indices[indptr[6]:indptr[7]].tolist() == topology.neighbours[6].tolist()